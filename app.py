@@ -1,65 +1,1146 @@
 import streamlit as st
-from PIL import Image
-import io
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import base64
+import concurrent.futures
+import functools
+import gzip
+import hashlib
+import html
+import http.server
+import itertools
+import json
+import logging
+import multiprocessing
 import os
 import random
+import re
+import sys
+import threading
+import time
+import types
+from array import array
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+import assetpack
+import imaging
+import sharedcache
 
 # ----------------- Constants -----------------
-IMAGE_PATHS = {
-    "gallery": [
-        "images/image2.jpg",
-        "images/image3.jpg",
-        "images/image4.jpg",
-        "images/image5.jpg",
-        "images/image6.jpg",
-        "images/image8.jpg",
-        "images/image10.jpg",
-        "images/image1.jpg",
-        "images/image11.jpg"
-    ],
-    "memory": [
-        "images/image5.jpg",
-        "images/image2.jpg",
-        "images/image9.jpg"
-    ],
-    "gift": "images/image7.jpg",
-    "puzzle": "images/image9.jpg",
-    "cake": {
-        "classic": "images/cake/classic.jpg",
-        "chocolate": "images/cake/chocolate.jpg",
-        "strawberry": "images/cake/strawberry.jpg"
-    }
+logger = logging.getLogger("webapp")
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Event configs are <event id>.json files here, chosen per session with ?event=<id>.
+# Pages an event lists no images for show the default event's.
+EVENTS_DIR = os.environ.get("EVENTS_DIR", os.path.join(APP_DIR, "events"))
+DEFAULT_EVENT = "default"
+EVENT_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+IMAGES_DIR = "images"
+FONTS_DIR = "fonts"
+IMAGE_MANIFEST_PATH = os.environ.get("IMAGE_MANIFEST_PATH", assetpack.APP_MANIFEST_PATH)
+# Seconds between manifest rescans for added, changed or removed images; 0 disables watching
+MANIFEST_POLL_SECONDS = float(os.environ.get("MANIFEST_POLL_SECONDS", 2))
+# Painted behind images whose dominant color is not in the manifest
+PLACEHOLDER_COLOR = "var(--accent)"
+# Shape of placeholders for images whose dimensions are not in the manifest
+PLACEHOLDER_ASPECT_RATIO = "4 / 3"
+
+# Per-rerun section timings, emitted bytes and image counters are appended here as
+# JSON lines when set
+METRICS_LOG = os.environ.get("METRICS_LOG", "")
+# Serve Prometheus text metrics at /metrics on ASSET_SERVER_PORT
+METRICS_ENDPOINT = os.environ.get("METRICS_ENDPOINT", "0") == "1"
+
+# Byte budget for encoded image payloads shared by every session in the process
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Share of that budget one event may hold before its own least recently used
+# entries are evicted; an event config can override it with cache_quota_bytes
+EVENT_CACHE_QUOTA_BYTES = int(os.environ.get("EVENT_CACHE_QUOTA_BYTES", 16 * 1024 * 1024))
+# Directory of encoded derivatives shared by every replica on the host, so each
+# derivative is encoded once between them; empty disables
+DERIVATIVE_CACHE_DIR = os.environ.get("DERIVATIVE_CACHE_DIR", "")
+DERIVATIVE_CACHE_MAX_BYTES = int(os.environ.get("DERIVATIVE_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Worker processes that pre-encode every page image when the app starts; 0 disables
+WARMUP_WORKERS = int(os.environ.get("WARMUP_WORKERS", min(4, os.cpu_count() or 1)))
+# Seconds the whole warm-up may take before unfinished work is abandoned
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_TIMEOUT_SECONDS", 300))
+# Threads shared by all sessions that load page images ahead of display, and how
+# many images one page may have queued or loading at once
+IMAGE_PIPELINE_WORKERS = int(os.environ.get("IMAGE_PIPELINE_WORKERS", 4))
+IMAGE_PIPELINE_DEPTH = 3
+
+# CSS box (width, height) each page displays images in; derivatives are resized to cover it
+IMAGE_VARIANTS = {
+    "gallery": (300, 300),
+    "memory": (500, None),
+    "cake": (600, None),
+    "gift": (260, 260)
+}
+SRCSET_DENSITIES = (1, 2)
+# Largest side (px) of the square the puzzle image is cropped to before tiling
+PUZZLE_BOARD_SIZE = 1000
+PUZZLE_GRID = 3
+PUZZLE_GRID_SIZES = list(range(3, 11))
+# Gallery tiles encoded and sent per page, whatever the album size
+GALLERY_PAGE_SIZE = int(os.environ.get("GALLERY_PAGE_SIZE", 12))
+# JPEG or WEBP (falls back to JPEG when Pillow lacks WebP support)
+DERIVATIVE_FORMAT = os.environ.get("DERIVATIVE_FORMAT", "JPEG").upper()
+DERIVATIVE_QUALITY = 82
+
+# How pages reference images and the stylesheet:
+#   inline - images as base64 data URIs embedded in the HTML (default)
+#   static - content-hashed files under ./static, served by Streamlit at app/static/
+#   server - content-hashed files served by a built-in server with immutable caching
+# The stylesheet and fonts are always content-hashed files; outside server mode they
+# rely on server.enableStaticServing (set in .streamlit/config.toml).
+ASSET_MODE = os.environ.get("ASSET_MODE", "inline")
+ASSET_DIR = os.environ.get("ASSET_DIR", os.path.join(APP_DIR, "static", "assets"))
+ASSET_SERVER_PORT = int(os.environ.get("ASSET_SERVER_PORT", 8502))
+# The asset server also answers /metrics, which reveals event ids and cache
+# internals, so it listens on loopback unless told otherwise
+ASSET_SERVER_HOST = os.environ.get("ASSET_SERVER_HOST", "127.0.0.1")
+# In server mode browsers fetch assets from the asset server itself, at an address
+# only the deployment knows; a guessed localhost URL breaks every remote viewer
+ASSET_BASE_URL = os.environ.get("ASSET_BASE_URL", "" if ASSET_MODE == "server" else "app/static/assets")
+if ASSET_MODE == "server" and not ASSET_BASE_URL:
+    raise ValueError(
+        "ASSET_MODE=server needs ASSET_BASE_URL, the asset server's address as browsers reach it "
+        f"(e.g. https://assets.example.com or http://<host>:{ASSET_SERVER_PORT})"
+    )
+# Memory-mapped pack of images/ and published assets, built by assetpack.py; files
+# are read from it instead of from disk while their content hash still matches
+ASSET_PACK = os.environ.get("ASSET_PACK", os.path.join(APP_DIR, assetpack.DEFAULT_PATH))
+ASSET_CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".png": "image/png",
+    ".woff2": "font/woff2"
 }
 
 
 # ----------------- Helper Functions -----------------
-def image_to_base64(image):
-    """Convert PIL image to base64 string"""
-    buffered = io.BytesIO()
-    image.save(buffered, format="JPEG")
-    return base64.b64encode(buffered.getvalue()).decode()
-
-def verify_image_paths():
-    """Check if all required images exist"""
+def verify_image_paths(images):
+    """Check if all images an event shows exist"""
+    manifest = get_manifest()
     missing = []
-    for key, paths in IMAGE_PATHS.items():
+    for key, paths in images.items():
         if key in ["gallery", "memory"]:
             for path in paths:
-                if not os.path.exists(path):
+                if path not in manifest:
                     missing.append(path)
         elif key == "cake":
             for path in paths.values():
-                if not os.path.exists(path):
+                if path not in manifest:
                     missing.append(path)
         else:
-            if not os.path.exists(paths):
+            if paths not in manifest:
                 missing.append(paths)
     return missing
 
+# ----------------- Instrumentation -----------------
+class Metrics:
+    """Process-wide counters and section timings.
+
+    The outermost span on a thread (main() for a full rerun, the page function
+    for a fragment rerun) collects a per-rerun record of section times and
+    counter increments, which is appended to METRICS_LOG when set."""
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self.counters = defaultdict(float)
+        self.sections = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def count(self, name, value=1):
+        record = getattr(self._local, "record", None)
+        with self._lock:
+            self.counters[name] += value
+            if record is not None:
+                record["counters"][name] = record["counters"].get(name, 0) + value
+
+    def current_record(self):
+        return getattr(self._local, "record", None)
+
+    @contextmanager
+    def attach(self, record):
+        """Count into record, taken from current_record on another thread, while
+        doing work on that thread's behalf"""
+        previous = getattr(self._local, "record", None)
+        self._local.record = record
+        try:
+            yield
+        finally:
+            self._local.record = previous
+
+    def annotate(self, key, value):
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            record[key] = value
+
+    @contextmanager
+    def span(self, name):
+        record = getattr(self._local, "record", None)
+        outermost = record is None
+        if outermost:
+            record = self._local.record = {"time": time.time(), "root": name, "sections_ms": {}, "counters": {}}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            sections = record["sections_ms"]
+            sections[name] = sections.get(name, 0) + elapsed * 1000
+            with self._lock:
+                totals = self.sections[name]
+                totals[0] += 1
+                totals[1] += elapsed
+            if outermost:
+                self._local.record = None
+                self.count("reruns")
+                self._write(record)
+
+    def _write(self, record):
+        if not self.log_path:
+            return
+        with self._lock:
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def prometheus(self, image_cache=None, warmup=None):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = dict(self.counters)
+            sections = {name: tuple(totals) for name, totals in self.sections.items()}
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE webapp_{name}_total counter")
+            lines.append(f"webapp_{name}_total {value:g}")
+        lines.append("# TYPE webapp_section_seconds summary")
+        for name, (count, seconds) in sorted(sections.items()):
+            lines.append(f'webapp_section_seconds_count{{section="{name}"}} {count}')
+            lines.append(f'webapp_section_seconds_sum{{section="{name}"}} {seconds:.6f}')
+        if image_cache is not None:
+            lines.append("# TYPE webapp_image_cache_bytes gauge")
+            lines.append(f"webapp_image_cache_bytes {image_cache.current_bytes}")
+            lines.append("# TYPE webapp_image_cache_entries gauge")
+            lines.append(f"webapp_image_cache_entries {len(image_cache)}")
+            lines.append("# TYPE webapp_event_cache_bytes gauge")
+            for owner, size in sorted(image_cache.owner_bytes.copy().items(), key=lambda item: str(item[0])):
+                if owner is not None:
+                    lines.append(f'webapp_event_cache_bytes{{event="{owner}"}} {size}')
+        if warmup is not None:
+            lines.append("# TYPE webapp_warmup_ready gauge")
+            lines.append(f"webapp_warmup_ready {int(warmup.ready.is_set())}")
+            if warmup.seconds is not None:
+                lines.append("# TYPE webapp_warmup_seconds gauge")
+                lines.append(f"webapp_warmup_seconds {warmup.seconds:.6f}")
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource
+def get_metrics():
+    return Metrics(METRICS_LOG)
+
+def timed(name):
+    """Decorator recording the wall time of each call as section name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def render_html(html, container=st):
+    """st.markdown for trusted HTML, counting the bytes sent to the browser"""
+    get_metrics().count("html_bytes", len(html.encode()))
+    container.markdown(html, unsafe_allow_html=True)
+
+def render_error(message, container=st):
+    """st.error, counting the message toward the bytes sent to the browser"""
+    get_metrics().count("html_bytes", len(message.encode()))
+    container.error(message)
+
+def render_component(component, data, **kwargs):
+    """Mount a bidi component, counting its serialized data toward the bytes
+    sent to the browser"""
+    get_metrics().count("html_bytes", len(json.dumps(data).encode()))
+    return component(data=data, **kwargs)
+
+# ----------------- Image Manifest -----------------
+class ImageManifest:
+    """Dimensions, content hash, dominant color, mtime and size of every image
+    under a directory.
+
+    Entries are keyed by path relative to the working directory, as in event
+    configs. scan() only re-reads files whose mtime or size changed. known
+    entries, such as those precompiled into the asset pack, seed a manifest
+    that was never persisted, and files whose content hash matches one are
+    not decoded again. Files that cannot be described are logged and left
+    out until they change."""
+
+    def __init__(self, root, path=None, known=None):
+        self.root = root
+        self.path = path
+        self.entries = dict(known or {})
+        self._known = {entry["sha256"]: entry for entry in self.entries.values()}
+        # path -> (mtime_ns, size) of files that failed to read, so they are not retried until they change
+        self._failed = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    def _read_entry(self, path, stat):
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        known = self._known.get(digest)
+        if known is not None:
+            info = {"width": known["width"], "height": known["height"], "color": known["color"]}
+        else:
+            info = imaging.describe(path)
+        return {
+            **info,
+            "sha256": digest,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size
+        }
+
+    def scan(self):
+        """Bring the manifest up to date and return the paths that changed"""
+        with self._lock:
+            entries = {}
+            changed = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if os.path.splitext(filename)[1].lower() not in assetpack.IMAGE_EXTENSIONS:
+                        continue
+                    path = os.path.join(dirpath, filename).replace(os.sep, "/")
+                    try:
+                        stat = os.stat(path)
+                        entry = self.entries.get(path)
+                        if (entry is None or "color" not in entry
+                                or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size):
+                            if self._failed.get(path) == (stat.st_mtime_ns, stat.st_size):
+                                continue
+                            entry = self._read_entry(path, stat)
+                            changed.append(path)
+                    except OSError:
+                        continue
+                    except Exception as e:
+                        # E.g. Pillow's DecompressionBombError; one bad image must not
+                        # keep every other image out of the manifest
+                        self._failed[path] = (stat.st_mtime_ns, stat.st_size)
+                        logger.warning("Image %s left out of the manifest: %s", path, e)
+                        continue
+                    self._failed.pop(path, None)
+                    entries[path] = entry
+            changed.extend(path for path in self.entries if path not in entries)
+            # Swap in a new dict so readers never see a half-updated manifest
+            self.entries = entries
+            if changed and self.path:
+                try:
+                    self.save()
+                except OSError:
+                    # Persisting only saves rehashing on the next start
+                    pass
+            return changed
+
+    def save(self):
+        data = json.dumps(self.entries, indent=1, sort_keys=True).encode()
+        _write_atomic(self.path, data)
+
+    def watch(self, interval):
+        """Rescan every interval seconds on a daemon thread"""
+        def poll():
+            while True:
+                time.sleep(interval)
+                # A failed scan must not end the thread, or the manifest never updates again
+                try:
+                    self.scan()
+                except Exception:
+                    logger.exception("Image manifest rescan failed")
+        threading.Thread(target=poll, name="manifest-watcher", daemon=True).start()
+
+@st.cache_resource
+def get_manifest():
+    """Image manifest built once per process and kept current by a watcher"""
+    pack = get_asset_pack()
+    manifest = ImageManifest(IMAGES_DIR, IMAGE_MANIFEST_PATH, pack.manifest() if pack is not None else None)
+    manifest.scan()
+    if MANIFEST_POLL_SECONDS > 0:
+        manifest.watch(MANIFEST_POLL_SECONDS)
+    return manifest
+
+# ----------------- Asset Pack -----------------
+@st.cache_resource
+def get_asset_pack():
+    """The asset pack mapped once per process, or None when none has been built"""
+    if not os.path.isfile(ASSET_PACK):
+        return None
+    return assetpack.AssetPack(ASSET_PACK)
+
+def packed_file(path, sha256=None):
+    """Zero-copy contents of a file from the asset pack, or None when it is not packed
+    (or, given sha256, when the packed copy is out of date)"""
+    pack = get_asset_pack()
+    if pack is None:
+        return None
+    data = pack.get(assetpack.pack_name(path, APP_DIR), sha256)
+    if data is not None:
+        get_metrics().count("pack_reads")
+    return data
+
+def image_source(path):
+    """What Pillow should read an image from: its packed bytes when current, else the path"""
+    entry = get_manifest().get(path)
+    data = packed_file(path, entry["sha256"]) if entry else None
+    return path if data is None else data
+
+# ----------------- Image Cache -----------------
+class ImageCache:
+    """Least recently used cache of encoded image payloads, bounded by total bytes.
+
+    Entries may be stored for an owner (an event) with a byte quota. Once an
+    owner holds more than its quota, its own least recently used entries are
+    evicted, so one busy event cannot push every other event out of the
+    cache. Keys are content hashes, so an entry is shared by every event
+    showing the image and counts against the one that stored it."""
+
+    def __init__(self, max_bytes, metrics=None):
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self.current_bytes = 0
+        self.owner_bytes = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, owner), and each owner's keys, both least recently used first
+        self._entries = OrderedDict()
+        self._owned = defaultdict(OrderedDict)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # A peek: neither counted as a hit or miss nor marked as recently used
+        return key in self._entries
+
+    def get(self, key):
+        value = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, owner = entry
+                self._entries.move_to_end(key)
+                self._owned[owner].move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if self.metrics is not None:
+            self.metrics.count("image_cache_hits" if value is not None else "image_cache_misses")
+        return value
+
+    def put(self, key, value, owner=None, quota=None):
+        size = len(value)
+        if size > self.max_bytes or (quota is not None and size > quota):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, owner)
+            self._owned[owner][key] = None
+            self.current_bytes += size
+            self.owner_bytes[owner] += size
+            while quota is not None and self.owner_bytes[owner] > quota:
+                self._remove(next(iter(self._owned[owner])))
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        value, owner = self._entries.pop(key)
+        del self._owned[owner][key]
+        self.current_bytes -= len(value)
+        self.owner_bytes[owner] -= len(value)
+        if not self._owned[owner]:
+            del self._owned[owner]
+            del self.owner_bytes[owner]
+
+@st.cache_resource
+def get_image_cache():
+    """Process-wide image cache, shared across sessions and reruns"""
+    return ImageCache(IMAGE_CACHE_MAX_BYTES, get_metrics())
+
+@st.cache_resource
+def get_shared_cache():
+    """Derivative cache directory shared with other processes, or None"""
+    if not DERIVATIVE_CACHE_DIR:
+        return None
+    return sharedcache.SharedCache(DERIVATIVE_CACHE_DIR, DERIVATIVE_CACHE_MAX_BYTES)
+
+def _shared_key(path, box):
+    """Shared cache key of a derivative; spells out every encoding parameter,
+    since other processes may run with different settings"""
+    return _image_key(path, box, _derivative_format(), DERIVATIVE_QUALITY)
+
+def _shared_tile_keys(path, grid):
+    return [_image_key(path, "tile", grid, tile, PUZZLE_BOARD_SIZE, DERIVATIVE_QUALITY) for tile in range(grid * grid)]
+
+def _cache_owner():
+    """(event id, quota) that image cache entries stored by this session count against"""
+    event = st.session_state.get("event")
+    return (event.id, event.cache_quota) if event is not None else (None, None)
+
+def _image_key(path, *transform):
+    """Cache key of an image by content hash, so renamed or shared files hit the same entry"""
+    entry = get_manifest().get(path)
+    if entry is None:
+        raise FileNotFoundError(f"Image not found: {path}")
+    return (entry["sha256"],) + transform
+
+def image_color(path):
+    """Dominant color of an image, painted in its place until the image loads"""
+    entry = get_manifest().get(path)
+    return entry.get("color", PLACEHOLDER_COLOR) if entry else PLACEHOLDER_COLOR
+
+def image_aspect_ratio(path):
+    """CSS aspect-ratio of an image, so its placeholder takes the space the image will"""
+    entry = get_manifest().get(path)
+    return f"{entry['width']} / {entry['height']}" if entry else PLACEHOLDER_ASPECT_RATIO
+
+def _derivative_format():
+    if DERIVATIVE_FORMAT == "WEBP" and imaging.has_webp():
+        return "WEBP"
+    return "JPEG"
+
+def encode_image_file(path, box=None):
+    """Read an image file as JPEG bytes, or as a derivative resized to cover box"""
+    return imaging.encode_image_file(
+        image_source(path), box, _derivative_format(), DERIVATIVE_QUALITY, get_metrics().count
+    )
+
+def _variant_box(role, density):
+    width, height = IMAGE_VARIANTS[role]
+    return (width * density, height * density if height else None)
+
+def _cached(key, build):
+    """Return the shared cache entry for key, building and storing it on a miss"""
+    cache = get_image_cache()
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.put(key, value, *_cache_owner())
+    return value
+
+def _transform(role, density):
+    return () if role is None else (role, density, _derivative_format())
+
+def _build_derivative(path, box):
+    # Originals are mostly passed through from disk already, so only
+    # derivatives go through the shared cache
+    shared = get_shared_cache()
+    if shared is None or box is None:
+        return encode_image_file(path, box)
+    return shared.get_or_build(_shared_key(path, box), lambda: encode_image_file(path, box), get_metrics().count)
+
+def _encode(path, role, density):
+    return _build_derivative(path, None if role is None else _variant_box(role, density))
+
+def load_image_bytes(path, role=None, density=1):
+    """Return encoded bytes of an image, or of its derivative for a display role"""
+    return _cached(_image_key(path, *_transform(role, density)), lambda: _encode(path, role, density))
+
+def load_image_base64(path, role=None, density=1):
+    """Return the base64 payload of an image or derivative via the shared cache.
+
+    Built straight from freshly encoded bytes, which are not cached as well:
+    inlined pages only read the payload, and keeping both would cost every
+    image 2.33 times its size in the cache and its event's quota."""
+    return _cached(
+        _image_key(path, *_transform(role, density), "base64"),
+        lambda: base64.b64encode(_encode(path, role, density)).decode()
+    )
+
+def image_mime(role=None):
+    return "image/webp" if role is not None and _derivative_format() == "WEBP" else "image/jpeg"
+
+def image_data_uri(path, role=None, density=1):
+    return f"data:{image_mime(role)};base64,{load_image_base64(path, role, density)}"
+
+def image_srcset(path, role, uri=image_data_uri):
+    """srcset value listing the derivative of every density in SRCSET_DENSITIES"""
+    return ", ".join(f"{uri(path, role, density)} {density}x" for density in SRCSET_DENSITIES)
+
+def image_attrs(path, role):
+    """src and srcset attributes for an <img> showing the derivative sized for role.
+
+    Inline data URIs would carry every srcset candidate, so when inlining only
+    the 1x derivative is embedded."""
+    if ASSET_MODE == "inline":
+        return f'src="{image_data_uri(path, role)}"'
+    return f'src="{image_url(path, role)}" srcset="{image_srcset(path, role, image_url)}"'
+
+# ----------------- Asset Serving -----------------
+class AssetRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves content-hashed assets from ASSET_DIR with immutable caching headers,
+    and Prometheus metrics at /metrics.
+
+    Assets found in the asset pack are written straight from its memory map;
+    their hashed names guarantee the packed copy is current."""
+
+    def do_GET(self):
+        self._send(head_only=False)
+
+    def do_HEAD(self):
+        self._send(head_only=True)
+
+    def _send(self, head_only):
+        if self.path.split("?", 1)[0] == "/metrics":
+            self._send_metrics(head_only)
+            return
+        name = os.path.basename(self.path.split("?", 1)[0])
+        path = os.path.join(ASSET_DIR, name)
+        if not name or name.endswith(".gz") or not self._exists(path):
+            self.send_error(404)
+            return
+        # Asset names are content hashes, so the name doubles as the ETag
+        etag = f'"{os.path.splitext(name)[0]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self._send_cache_headers(etag)
+            self.end_headers()
+            return
+        content_type = ASSET_CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        encoding = None
+        if "gzip" in self.headers.get("Accept-Encoding", "") and self._exists(path + ".gz"):
+            path += ".gz"
+            encoding = "gzip"
+        data = self._read(path)
+        self.send_response(200)
+        self._send_cache_headers(etag)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(data)
+
+    def _packed(self, path):
+        pack = self.server.pack
+        return None if pack is None else pack.get(assetpack.pack_name(path, APP_DIR))
+
+    def _exists(self, path):
+        return self._packed(path) is not None or os.path.isfile(path)
+
+    def _read(self, path):
+        data = self._packed(path)
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        return data
+
+    def _send_metrics(self, head_only):
+        data = self.server.metrics.prometheus(self.server.image_cache, self.server.warmup).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(data)
+
+    def _send_cache_headers(self, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def log_message(self, format, *args):
+        pass
+
+@st.cache_resource
+def start_asset_server():
+    """Start the asset and /metrics server once per process on a daemon thread.
+
+    Returns None when the port cannot be bound, e.g. because another replica
+    on the host already serves it; pages keep rendering without it."""
+    try:
+        server = http.server.ThreadingHTTPServer((ASSET_SERVER_HOST, ASSET_SERVER_PORT), AssetRequestHandler)
+    except OSError as e:
+        logger.warning("Asset and metrics server not started on %s:%s: %s", ASSET_SERVER_HOST, ASSET_SERVER_PORT, e)
+        return None
+    server.metrics = get_metrics()
+    server.image_cache = get_image_cache()
+    server.pack = get_asset_pack()
+    server.warmup = start_warmup()
+    threading.Thread(target=server.serve_forever, name="asset-server", daemon=True).start()
+    return server
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def asset_url(name):
+    if ASSET_MODE == "server":
+        start_asset_server()
+    return f"{ASSET_BASE_URL.rstrip('/')}/{name}"
+
+def publish_asset(data, ext):
+    """Write data under its content-hashed name in ASSET_DIR and return its URL.
+
+    Text assets also get a precompressed .gz sibling."""
+    name = hashlib.sha256(data).hexdigest()[:20] + ext
+    path = os.path.join(ASSET_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(ASSET_DIR, exist_ok=True)
+        if ext in (".css", ".js", ".svg"):
+            _write_atomic(path + ".gz", gzip.compress(data, 9))
+        _write_atomic(path, data)
+    return asset_url(name)
+
+def image_url(path, role=None, density=1):
+    """URL of an image or derivative published as a content-hashed asset"""
+    ext = ".webp" if image_mime(role) == "image/webp" else ".jpg"
+    return _cached(
+        _image_key(path, *_transform(role, density), "url"),
+        lambda: publish_asset(load_image_bytes(path, role, density), ext)
+    )
+
+def image_src(path, role=None, density=1):
+    """Value for an image src: a data URI when inlining, otherwise an asset URL"""
+    if ASSET_MODE == "inline":
+        return image_data_uri(path, role, density)
+    return image_url(path, role, density)
+
+def image_attrs_cached(path, role):
+    """Whether image_attrs(path, role) is answered from the image cache alone"""
+    kind, densities = ("base64", (1,)) if ASSET_MODE == "inline" else ("url", SRCSET_DENSITIES)
+    try:
+        return all(_image_key(path, *_transform(role, density), kind) in get_image_cache() for density in densities)
+    except FileNotFoundError:
+        return False
+
+# ----------------- Puzzle Tiles -----------------
+def load_puzzle_tile(path, grid, tile):
+    """Return the JPEG bytes of one tile, cutting the whole image once on a miss"""
+    cache = get_image_cache()
+    data = cache.get(_image_key(path, "tile", grid, tile))
+    if data is None:
+        def cut():
+            return imaging.cut_puzzle_tiles(
+                image_source(path), grid, PUZZLE_BOARD_SIZE, DERIVATIVE_QUALITY, get_metrics().count
+            )
+        shared = get_shared_cache()
+        if shared is None:
+            tiles = cut()
+        else:
+            tiles = shared.get_or_build_all(_shared_tile_keys(path, grid), cut, get_metrics().count)
+        owner = _cache_owner()
+        for i, tile_data in enumerate(tiles):
+            cache.put(_image_key(path, "tile", grid, i), tile_data, *owner)
+        data = tiles[tile]
+    return data
+
+def puzzle_tile_url(path, grid, tile):
+    """URL of a puzzle tile published as a content-hashed asset"""
+    return _cached(
+        _image_key(path, "tile", grid, tile, "url"),
+        lambda: publish_asset(load_puzzle_tile(path, grid, tile), ".jpg")
+    )
+
+# ----------------- Warm-up -----------------
+class WarmUp:
+    """Pre-encodes every image and puzzle tile an event's pages show into the
+    shared image cache, so the first visitor to each page does not pay for
+    decoding.
+
+    Encoding fans out over a process pool driven from a daemon thread, so the
+    server keeps accepting sessions meanwhile. ready is set when it finishes
+    and seconds records how long it took. Workers read and fill the shared
+    derivative cache, so replicas starting together do not each encode
+    everything."""
+
+    def __init__(self, workers, event):
+        self.workers = workers
+        self.event = event
+        self.ready = threading.Event()
+        self.seconds = None
+        self.failed = 0
+
+    def start(self):
+        if self.workers <= 0 or self.event is None:
+            self.ready.set()
+            return self
+        thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        # The thread reads the process-wide caches, which need a script context
+        add_script_run_ctx(thread, get_script_run_ctx())
+        thread.start()
+        return self
+
+    def tasks(self):
+        """Yield (task, args, store) for everything pages request; store puts a
+        task's result into the cache and publishes what pages reference"""
+        images = self.event.images
+        sources = [(path, "gallery", image_src) for path in images["gallery"]]
+        sources += [(path, "memory", image_src) for path in images["memory"]]
+        sources += [(images["gift"], "gift", image_url)]
+        sources += [(path, "cake", image_url) for path in images["cake"].values()]
+        manifest = get_manifest()
+        shared = get_shared_cache()
+        seen = set()
+        for path, role, publish in sources:
+            if path not in manifest:
+                continue
+            # Inlined pages embed only the 1x derivative (see image_attrs)
+            densities = (1,) if publish is image_src and ASSET_MODE == "inline" else SRCSET_DENSITIES
+            for density in densities:
+                key = _image_key(path, *_transform(role, density))
+                if key in seen:
+                    continue
+                seen.add(key)
+                box = _variant_box(role, density)
+                args = (path, box, _derivative_format(), DERIVATIVE_QUALITY, shared, _shared_key(path, box))
+                yield imaging.encode_task, args, functools.partial(
+                    self._store_image, key, publish, path, role, density
+                )
+        path = images["puzzle"]
+        if path in manifest:
+            args = (path, PUZZLE_GRID, PUZZLE_BOARD_SIZE, DERIVATIVE_QUALITY, shared, _shared_tile_keys(path, PUZZLE_GRID))
+            yield imaging.cut_puzzle_tiles_task, args, functools.partial(self._store_tiles, path, PUZZLE_GRID)
+
+    def _store_image(self, key, publish, path, role, density, data):
+        if publish is image_src and ASSET_MODE == "inline":
+            # Inlined pages only read the base64 payload (see load_image_base64)
+            key, data = key + ("base64",), base64.b64encode(data).decode()
+        get_image_cache().put(key, data, self.event.id, self.event.cache_quota)
+        publish(path, role, density)
+
+    def _store_tiles(self, path, grid, tiles):
+        for tile, data in enumerate(tiles):
+            get_image_cache().put(_image_key(path, "tile", grid, tile), data, self.event.id, self.event.cache_quota)
+            puzzle_tile_url(path, grid, tile)
+
+    def _executor(self):
+        # Never fork the running server: a child could inherit a lock (such as
+        # the import lock) held by one of its other threads and hang. Workers
+        # come from a fork server, or a fresh interpreter, that imports only
+        # the tasks' modules; see _hide_script for keeping app.py out of them.
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["imaging", "sharedcache"])
+        else:
+            context = multiprocessing.get_context("spawn")
+        return concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=context)
+
+    @staticmethod
+    @contextmanager
+    def _hide_script():
+        """Hide app.py from multiprocessing while worker processes start.
+
+        Streamlit runs this script as __main__, and a new worker re-imports the
+        parent's __main__ before its first task, which would run the whole app,
+        Streamlit included, in every worker. ProcessPoolExecutor only starts
+        workers from submit(), so covering the submissions covers every start."""
+        script = sys.modules["__main__"]
+        placeholder = types.ModuleType("__main__")
+        sys.modules["__main__"] = placeholder
+        try:
+            yield
+        finally:
+            # A rerun that started meanwhile installed its own module; keep it
+            if sys.modules.get("__main__") is placeholder:
+                sys.modules["__main__"] = script
+
+    def _abandon(self, pool):
+        """Shut down a pool without waiting for workers that stopped answering"""
+        pool.shutdown(wait=False, cancel_futures=True)
+        # ProcessPoolExecutor only gained a public way to stop its workers in
+        # Python 3.14; a worker left running would also block interpreter exit
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+
+    def _run(self):
+        metrics = get_metrics()
+        start = time.perf_counter()
+        pool = None
+        try:
+            with metrics.span("warmup"):
+                pool = self._executor()
+                futures = {}
+                tasks = list(self.tasks())
+                with self._hide_script():
+                    for task, args, store in tasks:
+                        futures[pool.submit(task, *args)] = store
+                try:
+                    for future in concurrent.futures.as_completed(futures, timeout=WARMUP_TIMEOUT_SECONDS):
+                        try:
+                            result, counts = future.result()
+                            for name, value in counts.items():
+                                metrics.count(name, value)
+                            futures[future](result)
+                        except Exception:
+                            # Pages fall back to encoding on demand
+                            self.failed += 1
+                            metrics.count("warmup_failures")
+                except concurrent.futures.TimeoutError:
+                    unfinished = sum(1 for future in futures if not future.done())
+                    self.failed += unfinished
+                    metrics.count("warmup_failures", unfinished)
+                    self._abandon(pool)
+                    pool = None
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            self.seconds = time.perf_counter() - start
+            self.ready.set()
+
+@st.cache_resource
+def start_warmup():
+    """Start warming the default event's images once per process"""
+    try:
+        event = get_events().get(DEFAULT_EVENT)
+    except ValueError:
+        event = None
+    return WarmUp(WARMUP_WORKERS, event).start()
+
+# ----------------- Background Loading -----------------
+@st.cache_resource
+def get_image_executor():
+    """Thread pool shared by every session for loading images ahead of display"""
+    return concurrent.futures.ThreadPoolExecutor(IMAGE_PIPELINE_WORKERS, thread_name_prefix="image-loader")
+
+def _run_for_rerun(ctx, record, func, item):
+    # Pool threads reach the process-wide caches, which need a script context,
+    # and their counters belong to the rerun that queued them
+    add_script_run_ctx(threading.current_thread(), ctx)
+    with get_metrics().attach(record):
+        return func(item)
+
+def load_ahead(func, items, depth=IMAGE_PIPELINE_DEPTH, ordered=False, cached=None):
+    """Run func over items on the shared image pool and yield (index, future) as
+    each call finishes, or in item order when ordered.
+
+    Calls start in item order with at most depth queued or running at once, so
+    the first results arrive after about one call's time however long items
+    is. Items for which cached(item) is true are run on the calling thread
+    instead, so cache hits never queue behind other sessions' misses. Calls
+    not yet yielded are cancelled if the caller stops early."""
+    executor = get_image_executor()
+    ctx, record = get_script_run_ctx(), get_metrics().current_record()
+    pending = enumerate(items)
+    running = {}
+
+    def submit():
+        for index, item in itertools.islice(pending, 1):
+            if cached is not None and cached(item):
+                future = concurrent.futures.Future()
+                try:
+                    future.set_result(func(item))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = executor.submit(_run_for_rerun, ctx, record, func, item)
+            running[future] = index
+
+    try:
+        for _ in range(depth):
+            submit()
+        while running:
+            if ordered:
+                done = [min(running, key=running.get)]
+                concurrent.futures.wait(done)
+            else:
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in sorted(done, key=running.get):
+                index = running.pop(future)
+                submit()
+                yield index, future
+    finally:
+        for future in running:
+            future.cancel()
+
+# ----------------- Puzzle Engine -----------------
+class PuzzleBoard:
+    """Swap puzzle on a grid x grid board, stored as a permutation of tile ids.
+
+    slots[i] is the tile shown in slot i and where[t] the slot holding tile t.
+    The number of misplaced tiles is kept up to date on every swap, so checking
+    for completion is O(1)."""
+
+    __slots__ = ("grid", "slots", "where", "misplaced")
+
+    def __init__(self, grid, slots=None):
+        size = grid * grid
+        self.grid = grid
+        self.slots = array("H", range(size) if slots is None else slots)
+        self.where = array("H", [0]) * size
+        for slot, tile in enumerate(self.slots):
+            self.where[tile] = slot
+        self.misplaced = sum(1 for slot, tile in enumerate(self.slots) if slot != tile)
+
+    @classmethod
+    def shuffled(cls, grid, rng=random):
+        slots = list(range(grid * grid))
+        while len(slots) > 1 and slots == sorted(slots):
+            rng.shuffle(slots)
+        return cls(grid, slots)
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def solved(self):
+        return self.misplaced == 0
+
+    def swap(self, a, b):
+        if a == b:
+            return
+        slots, where = self.slots, self.where
+        tile_a, tile_b = slots[a], slots[b]
+        before = (tile_a != a) + (tile_b != b)
+        slots[a], slots[b] = tile_b, tile_a
+        where[tile_a], where[tile_b] = b, a
+        self.misplaced += (tile_b != a) + (tile_a != b) - before
+
+    def hint(self):
+        """Optimal next swap as a pair of slots, or None when solved.
+
+        Any two slots may be swapped, so the fewest swaps left is the number of
+        tiles minus the number of permutation cycles. Moving the right tile into
+        the first misplaced slot always splits a cycle, so it is optimal; the
+        search is a single O(n) scan."""
+        if self.solved:
+            return None
+        for slot, tile in enumerate(self.slots):
+            if tile != slot:
+                return slot, self.where[slot]
+
+    def min_swaps(self):
+        """Number of swaps an optimal solution still needs"""
+        seen = bytearray(len(self.slots))
+        cycles = 0
+        for start in range(len(self.slots)):
+            if not seen[start]:
+                cycles += 1
+                slot = start
+                while not seen[slot]:
+                    seen[slot] = 1
+                    slot = self.slots[slot]
+        return len(self.slots) - cycles
+
+# ----------------- Events -----------------
+class Event:
+    """One celebration: who it is for, the images each page shows and its share
+    of the image cache. Events are shared by every session showing them, so
+    their markup is rendered once per process."""
+
+    def __init__(self, event_id, config):
+        self.id = event_id
+        self.config = config
+        self.name = config["name"]
+        self.title = config.get("title", f"Happy Birthday {self.name}!")
+        self.headline = config.get("headline", f"HAPPY BIRTHDAY {self.name.upper()}")
+        self.message = config.get("message", f"🎉 Happy Birthday {self.name}! 🎉")
+        self.profile = config.get("profile", {})
+        self.images = config["images"]
+        self.cache_quota = config.get("cache_quota_bytes", EVENT_CACHE_QUOTA_BYTES)
+        for key in ("gallery", "memory", "gift", "puzzle", "cake"):
+            if key not in self.images:
+                raise ValueError(f"no {key} image configured")
+
+    @functools.cached_property
+    def header_html(self):
+        return HEADER_HTML.format(headline=html.escape(self.headline))
+
+    @functools.cached_property
+    def profile_html(self):
+        details = "".join(
+            PROFILE_DETAIL_HTML.format(label=html.escape(label), value=html.escape(value))
+            for label, value in self.profile.get("details", {}).items()
+        )
+        return PROFILE_CARD_HTML.format(
+            icon=html.escape(self.profile.get("icon", "🦋")),
+            name=html.escape(self.name),
+            title=html.escape(self.profile.get("title", "")),
+            details=details
+        )
+
+class EventRegistry:
+    """Event configs read from <event id>.json files in a directory.
+
+    Files are read on first use and again whenever they or the default event
+    change, so events can be added or edited without a restart. Concurrent
+    first reads may both load a file; the last one wins, which is harmless."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._events = {}
+
+    def _stat(self, event_id):
+        try:
+            return os.stat(os.path.join(self.directory, f"{event_id}.json")).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, event_id):
+        with open(os.path.join(self.directory, f"{event_id}.json"), encoding="utf-8") as f:
+            config = json.load(f)
+        try:
+            if event_id != DEFAULT_EVENT:
+                default = self.get(DEFAULT_EVENT)
+                if default is not None:
+                    config["images"] = {**default.images, **config.get("images", {})}
+            return Event(event_id, config)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"malformed event config: {e!r}") from e
+
+    def get(self, event_id):
+        """The event with this id, None if there is none, or ValueError if its
+        config is invalid"""
+        if not EVENT_ID_PATTERN.fullmatch(event_id):
+            return None
+        stamp = (self._stat(event_id), self._stat(DEFAULT_EVENT))
+        if stamp[0] is None:
+            return None
+        cached = self._events.get(event_id)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        event = self._load(event_id)
+        self._events[event_id] = (stamp, event)
+        return event
+
+@st.cache_resource
+def get_events():
+    """Event registry shared by every session in the process"""
+    return EventRegistry(EVENTS_DIR)
+
 # ----------------- Configuration -----------------
+# Each session shows the event named by its ?event= query parameter
+event_id = st.query_params.get("event", DEFAULT_EVENT)
+try:
+    event = get_events().get(event_id)
+    event_error = None if event is not None else f"Unknown event: {event_id}"
+except ValueError as e:
+    event, event_error = None, f"Invalid event {event_id}: {e}"
+st.session_state.event = event
+
 st.set_page_config(
-    page_title="Happy Birthday Vyshnavi!", 
+    page_title=event.title if event is not None else "Happy Birthday!", 
     page_icon="🦋",
     layout="wide",
     initial_sidebar_state="expanded"
@@ -68,24 +1149,17 @@ st.set_page_config(
 # Initialize session state
 if 'current_page' not in st.session_state:
     st.session_state.current_page = "gallery"
-if 'gift_opened' not in st.session_state:
-    st.session_state.gift_opened = False
-if 'puzzle_complete' not in st.session_state:
-    st.session_state.puzzle_complete = False
-if 'puzzle_pieces' not in st.session_state:
-    # Create a shuffled list of positions for the puzzle
-    positions = [(x, y) for y in [0, 50, 100] for x in [0, 50, 100]]
-    random.shuffle(positions)
-    st.session_state.puzzle_pieces = positions
-if 'selected_piece' not in st.session_state:
-    st.session_state.selected_piece = None
+if 'puzzle_board' not in st.session_state:
+    st.session_state.puzzle_board = PuzzleBoard.shuffled(PUZZLE_GRID)
+if 'puzzle_hint' not in st.session_state:
+    st.session_state.puzzle_hint = None
 if 'selected_cake' not in st.session_state:
-    st.session_state.selected_cake = 'classic'
+    st.session_state.selected_cake = next(iter(event.images["cake"]), None) if event is not None else None
+if 'gallery_page' not in st.session_state:
+    st.session_state.gallery_page = 0
 
 # ----------------- CSS -----------------
-def load_css():
-    st.markdown("""
-        <style>
+APP_CSS = """
             :root {
                 --primary: #ff6b9e;
                 --secondary: #ff8fab;
@@ -315,6 +1389,20 @@ def load_css():
             .memory-image:hover {
                 transform: scale(1.03);
             }
+
+            .memory-placeholder {
+                width: 100%;
+                max-width: 500px;
+                aspect-ratio: 4 / 3;
+                border-radius: 15px;
+                background: var(--accent);
+                animation: placeholder-fade 1s ease-in-out infinite alternate;
+            }
+
+            @keyframes placeholder-fade {
+                from { opacity: 0.4; }
+                to { opacity: 0.8; }
+            }
             
             /* Gift Box Styles - Fixed for proper opening */
             .gift-box-container {
@@ -365,6 +1453,21 @@ def load_css():
                 padding: 20px;
                 flex-direction: column;
             }
+
+            .gift-toggle {
+                display: block;
+                width: 100%;
+                padding: 0.5rem;
+                border: 2px solid var(--accent);
+                border-radius: 10px;
+                background: white;
+                font-family: 'Poppins', sans-serif;
+                cursor: pointer;
+            }
+
+            .gift-toggle:hover {
+                border-color: var(--primary);
+            }
             
             /* Puzzle Game Styles */
             .puzzle-container {
@@ -377,7 +1480,7 @@ def load_css():
             
             .puzzle-piece {
                 aspect-ratio: 1;
-                background-size: 300% 300%;
+                background-size: cover;
                 background-repeat: no-repeat;
                 border-radius: 8px;
                 cursor: pointer;
@@ -395,6 +1498,10 @@ def load_css():
                 box-shadow: 0 0 15px var(--primary);
             }
             
+            .puzzle-piece.hint {
+                border: 3px dashed var(--info);
+            }
+            
             /* Cake Designer Styles */
             .cake-option {
                 display: flex;
@@ -434,7 +1541,30 @@ def load_css():
                 margin-top: 1rem;
                 box-shadow: 0 10px 20px rgba(0,0,0,0.1);
             }
-            
+
+            .cake-picker {
+                display: grid;
+                grid-template-columns: 1fr 1fr;
+                gap: 1rem;
+            }
+
+            .cake-options {
+                display: flex;
+                flex-direction: column;
+                gap: 0.5rem;
+            }
+
+            .cake-options .cake-option {
+                width: 100%;
+                border: 2px solid var(--accent);
+                background: white;
+            }
+
+            .cake-options .cake-option.selected {
+                border-color: var(--primary);
+                background-color: var(--accent);
+            }
+
             /* Confetti Animation */
             @keyframes confetti-fall {
                 0% { transform: translateY(-100vh) rotate(0deg); }
@@ -497,240 +1627,539 @@ def load_css():
                 font-weight: 800;
                 font-family: 'Poppins', sans-serif;
             }
-        </style>
-        
-        <link href="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;500;600;700&display=swap" rel="stylesheet">
-        <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700;800&display=swap" rel="stylesheet">
-    """, unsafe_allow_html=True)
+"""
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+def font_face_css():
+    """@font-face rules for the self-hosted WOFF2 fonts in FONTS_DIR.
+
+    Files are named <Family>-<weight>.woff2 and published next to the
+    stylesheet, so they are referenced by bare file name."""
+    rules = []
+    if not os.path.isdir(FONTS_DIR):
+        return ""
+    for filename in sorted(os.listdir(FONTS_DIR)):
+        match = re.fullmatch(r"(.+)-(\d{3})\.woff2", filename)
+        if not match:
+            continue
+        with open(os.path.join(FONTS_DIR, filename), "rb") as f:
+            url = publish_asset(f.read(), ".woff2")
+        family, weight = match.groups()
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; font-style: normal; font-weight: {weight}; "
+            f"font-display: swap; src: url({url.rsplit('/', 1)[1]}) format('woff2'); }}"
+        )
+    return "\n".join(rules)
+
+@st.cache_resource
+def get_stylesheet_url():
+    """Publish the minified stylesheet and its fonts once per process"""
+    return publish_asset(minify_css(font_face_css() + APP_CSS).encode(), ".css")
+
+@timed("css")
+def load_css():
+    # Only a link to the content-hashed stylesheet is sent on each rerun
+    render_html(f'<link href="{get_stylesheet_url()}" rel="stylesheet">')
+
+# ----------------- Client Components -----------------
+# The components reference images by content-hashed URL, never data URIs, so
+# a rerun only re-sends the small data payload.
+#
+# The cake picker swaps previews in the browser: every flavor's image is
+# prefetched when the page loads, a click only changes the <img> source, and
+# just the chosen flavor is synced back to the session.
+CAKE_PICKER_HTML = """
+<div class="cake-picker">
+    <div class="cake-result">
+        <img class="cake-preview" alt="Your Custom Birthday Cake" style="width: 100%;">
+        <p class="cake-caption" style="text-align: center;">Your Custom Birthday Cake</p>
+        <div class="birthday-message">
+            <h3 class="cake-message"></h3>
+        </div>
+    </div>
+    <div>
+        <h3 class="cake-option-text">Choose Your Flavor</h3>
+        <div class="cake-options"></div>
+    </div>
+</div>
+"""
+
+CAKE_PICKER_JS = """
+export default function ({ data, setStateValue, parentElement }) {
+    const preview = parentElement.querySelector(".cake-preview");
+    const options = parentElement.querySelector(".cake-options");
+    const show = (flavor) => {
+        preview.style.backgroundColor = data.colors[flavor];
+        preview.src = data.previews[flavor];
+        for (const button of options.children) {
+            button.classList.toggle("selected", button.dataset.flavor === flavor);
+        }
+    };
+    options.replaceChildren();
+    for (const [flavor, label] of Object.entries(data.labels)) {
+        new Image().src = data.previews[flavor];
+        const button = document.createElement("button");
+        button.className = "cake-option cake-option-text";
+        button.dataset.flavor = flavor;
+        button.textContent = label;
+        button.onclick = () => {
+            show(flavor);
+            setStateValue("flavor", flavor);
+        };
+        options.appendChild(button);
+    }
+    parentElement.querySelector(".cake-message").textContent = data.message;
+    show(data.selected);
+}
+"""
+
+cake_picker = st.components.v2.component(
+    "cake_picker",
+    html=CAKE_PICKER_HTML,
+    js=CAKE_PICKER_JS,
+    isolate_styles=False,
+)
+
+# The puzzle board keeps selection and swaps in the browser. Swaps are queued
+# and sent as one batch once clicking pauses, or straight away when the board
+# is solved, so the server sees one rerun per burst of moves.
+SWAP_PUZZLE_HTML = """
+<div class="puzzle-container"></div>
+"""
+
+SWAP_PUZZLE_JS = """
+const BATCH_DELAY_MS = 400;
+const queues = new WeakMap();
+
+export default function ({ data, setTriggerValue, parentElement }) {
+    let queue = queues.get(parentElement);
+    if (!queue || queue.grid !== data.grid) {
+        queue = { grid: data.grid, moves: [], timer: null };
+        queues.set(parentElement, queue);
+    }
+    const container = parentElement.querySelector(".puzzle-container");
+    const slots = data.slots.slice();
+    // Moves not yet sent stay applied on top of the server's board
+    for (const [a, b] of queue.moves) {
+        [slots[a], slots[b]] = [slots[b], slots[a]];
+    }
+    let selected = null;
+
+    const flush = () => {
+        clearTimeout(queue.timer);
+        queue.timer = null;
+        if (queue.moves.length) {
+            setTriggerValue("moves", queue.moves);
+            queue.moves = [];
+        }
+    };
+    const show = (slot) => {
+        pieces[slot].style.backgroundImage = `url("${data.tiles[slots[slot]]}")`;
+    };
+    const click = (slot) => {
+        if (selected === null) {
+            selected = slot;
+            pieces[slot].classList.add("selected");
+            return;
+        }
+        pieces[selected].classList.remove("selected");
+        if (selected !== slot) {
+            [slots[selected], slots[slot]] = [slots[slot], slots[selected]];
+            show(selected);
+            show(slot);
+            queue.moves.push([selected, slot]);
+            for (const piece of pieces) {
+                piece.classList.remove("hint");
+            }
+        }
+        selected = null;
+        clearTimeout(queue.timer);
+        if (slots.every((tile, i) => tile === i)) {
+            flush();
+        } else {
+            queue.timer = setTimeout(flush, BATCH_DELAY_MS);
+        }
+    };
+
+    container.style.gridTemplateColumns = `repeat(${data.grid}, 1fr)`;
+    const pieces = slots.map((tile, slot) => {
+        const piece = document.createElement("div");
+        piece.className = "puzzle-piece";
+        piece.classList.toggle("hint", !queue.moves.length && data.hint.includes(slot));
+        piece.onclick = () => click(slot);
+        return piece;
+    });
+    container.replaceChildren(...pieces);
+    slots.forEach((tile, slot) => show(slot));
+}
+"""
+
+swap_puzzle = st.components.v2.component(
+    "swap_puzzle",
+    html=SWAP_PUZZLE_HTML,
+    js=SWAP_PUZZLE_JS,
+    isolate_styles=False,
+)
+
+# The gift box opens and closes in the browser. Its image has no src until the
+# box is first opened, so closed views never download it; its dominant color
+# fills the box while it loads.
+GIFT_BOX_HTML = """
+<div class="gift-box-container">
+    <div class="gift-box">
+        <div class="gift-box-front">
+            <div style="text-align: center;">
+                <div style="font-size: 5rem;">🎁</div>
+                <p style="margin-top: 1rem; color: white;">Click to open!</p>
+            </div>
+        </div>
+        <div class="gift-box-back" style="display: flex; justify-content: center; align-items: center; height: 100%;">
+            <img alt="Your gift" style="width: 100%; height: 100%; object-fit: contain; border-radius:10px;">
+        </div>
+    </div>
+</div>
+<button class="gift-toggle">Open/Close Gift</button>
+"""
+
+GIFT_BOX_JS = """
+export default function ({ data, parentElement }) {
+    const box = parentElement.querySelector(".gift-box");
+    const image = parentElement.querySelector(".gift-box-back img");
+    const toggle = () => {
+        if (!image.getAttribute("src")) {
+            image.style.backgroundColor = data.color;
+            image.srcset = data.srcset;
+            image.src = data.src;
+        }
+        box.classList.toggle("opened");
+    };
+    box.onclick = toggle;
+    parentElement.querySelector(".gift-toggle").onclick = toggle;
+}
+"""
+
+gift_box = st.components.v2.component(
+    "gift_box",
+    html=GIFT_BOX_HTML,
+    js=GIFT_BOX_JS,
+    isolate_styles=False,
+)
+
+# ----------------- Event Handlers -----------------
+# Widgets apply state transitions through on_click/on_change callbacks, which
+# Streamlit runs before the rerun the interaction triggers, so every click costs
+# a single render and nothing calls st.rerun().
+def go_to_page(page_id):
+    st.session_state.current_page = page_id
+
+def go_to_gallery_page(page):
+    st.session_state.gallery_page = page
+
+def resize_puzzle():
+    new_puzzle(st.session_state.puzzle_grid)
+
+def new_puzzle(grid):
+    st.session_state.puzzle_board = PuzzleBoard.shuffled(grid)
+    st.session_state.puzzle_hint = None
+
+def apply_puzzle_moves():
+    board = st.session_state.puzzle_board
+    for move in st.session_state.swap_puzzle["moves"] or ():
+        # Moves come from the browser; drop anything that is not a pair of slots
+        if (isinstance(move, list) and len(move) == 2
+                and all(isinstance(slot, int) and 0 <= slot < len(board) for slot in move)):
+            board.swap(*move)
+    st.session_state.puzzle_hint = None
+
+def show_puzzle_hint():
+    st.session_state.puzzle_hint = st.session_state.puzzle_board.hint()
+
+def sync_cake_flavor():
+    flavor = st.session_state.cake_picker["flavor"]
+    # The flavor comes from the browser; ignore anything but a configured cake
+    if isinstance(flavor, str) and flavor in st.session_state.event.images["cake"]:
+        st.session_state.selected_cake = flavor
 
 # ----------------- Page Components -----------------
-def show_header():
-    st.markdown("""
+# Markup that never changes between reruns, built once (per event for templates)
+HEADER_HTML = """
         <div style="position: relative;">
-            <div class="birthday-title">HAPPY BIRTHDAY VYSHNAVI</div>
+            <div class="birthday-title">{headline}</div>
             <div class="butterfly" style="top: -20px; left: 10%; animation-delay: 0s;">🦋</div>
             <div class="butterfly" style="top: 50px; left: 30%; animation-delay: 2s;">🦋</div>
             <div class="butterfly" style="top: -10px; left: 70%; animation-delay: 4s;">🦋</div>
             <div class="butterfly" style="top: 60px; left: 90%; animation-delay: 6s;">🦋</div>
         </div>
-    """, unsafe_allow_html=True)
+"""
 
-def create_sidebar():
-    with st.sidebar:
-        st.markdown("""
+SIDEBAR_HTML = """
             <div style="text-align: center; margin-bottom: 2rem;">
                 <h2>Birthday Celebration</h2>
                 <p>Navigate through your birthday surprises!</p>
             </div>
-        """, unsafe_allow_html=True)
-        
-        pages = {
-            "gallery": "🖼️ Photo Gallery",
-            "memory": "🌟 Memory Lane",
-            "gift": "🎁 Virtual Gift",
-            "puzzle": "🧩 Photo Puzzle",
-            "cake": "🎂 Cake Designer"
-        }
-        
-        # Apply custom styling to buttons
-        for page_id, page_name in pages.items():
-            button_class = "active" if st.session_state.current_page == page_id else ""
-            if st.button(page_name, key=f"{page_id}_btn", 
-                        use_container_width=True,
-                        type="primary" if st.session_state.current_page == page_id else "secondary"):
-                st.session_state.current_page = page_id
-                st.rerun()
+"""
+
+PROFILE_CARD_HTML = """
+        <div class="profile-card">
+            <div class="profile-icon">{icon}</div>
+            <div class="profile-name">{name}</div>
+            <div class="profile-title">{title}</div>
+            <div class="profile-details">{details}
+            </div>
+        </div>
+"""
+
+PROFILE_DETAIL_HTML = """
+                <div class="detail-item">
+                    <div class="detail-label">{label}:</div>
+                    <div class="detail-value">{value}</div>
+                </div>"""
+
+MEMORY_PLACEHOLDER_HTML = """
+                <div class="memory-item">
+                    <div class="memory-placeholder" style="aspect-ratio: {ratio}; background-color: {color};"></div>
+                </div>
+"""
+
+PAGES = {
+    "gallery": "🖼️ Photo Gallery",
+    "memory": "🌟 Memory Lane",
+    "gift": "🎁 Virtual Gift",
+    "puzzle": "🧩 Photo Puzzle",
+    "cake": "🎂 Cake Designer"
+}
+
+# Header and every page are fragments, so a widget inside a page reruns only
+# that page. The sidebar is not: switching pages has to rerun the whole app.
+@st.fragment
+@timed("header")
+def show_header():
+    render_html(st.session_state.event.header_html)
+
+@timed("sidebar")
+def create_sidebar():
+    render_html(SIDEBAR_HTML)
+    
+    # Apply custom styling to buttons
+    for page_id, page_name in PAGES.items():
+        st.button(page_name, key=f"{page_id}_btn", 
+                  use_container_width=True,
+                  type="primary" if st.session_state.current_page == page_id else "secondary",
+                  on_click=go_to_page, args=(page_id,))
+
+def show_gallery_pager(page, page_count, position):
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", key=f"gallery_prev_{position}", use_container_width=True, disabled=page == 0,
+                  on_click=go_to_gallery_page, args=(page - 1,))
+    with col2:
+        render_html(f"<p style='text-align: center;'>Page {page + 1} of {page_count}</p>")
+    with col3:
+        st.button("Next ▶", key=f"gallery_next_{position}", use_container_width=True, disabled=page >= page_count - 1,
+                  on_click=go_to_gallery_page, args=(page + 1,))
 
+@st.fragment
+@timed("gallery")
 def show_gallery():
     # CHANGED: Updated heading to use centered, bold styling
-    st.markdown("<h2 class='section-header'>Photo Gallery</h2>", unsafe_allow_html=True)
-    st.markdown("<div class='gallery'>", unsafe_allow_html=True)
+    render_html("<h2 class='section-header'>Photo Gallery</h2>")
+    
+    # Only the current page of the album is encoded and sent
+    paths = st.session_state.event.images["gallery"]
+    page_count = max(1, -(-len(paths) // GALLERY_PAGE_SIZE))
+    page = min(st.session_state.gallery_page, page_count - 1)
+    start = page * GALLERY_PAGE_SIZE
+    if page_count > 1:
+        show_gallery_pager(page, page_count, "top")
+    
+    render_html("<div class='gallery'>")
     cols = st.columns(3)
-    for i, path in enumerate(IMAGE_PATHS["gallery"]):
+    # Every uncached tile on the page loads at once on the shared image pool
+    # and is shown in album order, so an uncached page waits for its slowest
+    # image rather than for all of them in turn
+    page_paths = paths[start:start + GALLERY_PAGE_SIZE]
+    tiles = load_ahead(
+        lambda path: image_attrs(path, "gallery"), page_paths, depth=len(page_paths), ordered=True,
+        cached=lambda path: image_attrs_cached(path, "gallery")
+    )
+    for i, future in tiles:
+        path = page_paths[i]
         with cols[i % 3]:
             try:
-                image = Image.open(path)
-                st.markdown(f"""
+                render_html(f"""
                     <div class="gallery-item">
                         <div class="gallery-item-inner">
-                            <img src="data:image/jpeg;base64,{image_to_base64(image)}" style="width:100%; height:100%; object-fit:cover;">
+                            <img {future.result()} loading="lazy" decoding="async" width="300" height="300" style="width:100%; height:100%; object-fit:cover; background-color: {image_color(path)};">
                         </div>
                     </div>
-                """, unsafe_allow_html=True)
+                """)
             except Exception as e:
-                st.error(f"Error loading image: {e}")
-    st.markdown("</div>", unsafe_allow_html=True)
+                render_error(f"Error loading image: {e}")
+    render_html("</div>")
+    
+    if page_count > 1:
+        show_gallery_pager(page, page_count, "bottom")
 
+@st.fragment
+@timed("memory")
 def show_memory_lane():
     # CHANGED: Updated heading to use centered, bold styling
-    st.markdown("<h2 class='section-header'>Memory Lane</h2>", unsafe_allow_html=True)
+    render_html("<h2 class='section-header'>Memory Lane</h2>")
     
-    st.markdown("<div class='memory-container'>", unsafe_allow_html=True)
+    render_html("<div class='memory-container'>")
     
-    for i, path in enumerate(IMAGE_PATHS["memory"]):
+    # Lay out a placeholder per memory, then fill each one as soon as its image
+    # is ready while the next few load in the background
+    paths = st.session_state.event.images["memory"]
+    slots = [st.empty() for _ in paths]
+    for path, slot in zip(paths, slots):
+        render_html(MEMORY_PLACEHOLDER_HTML.format(ratio=image_aspect_ratio(path), color=image_color(path)), slot)
+    memories = load_ahead(
+        lambda path: image_attrs(path, "memory"), paths, cached=lambda path: image_attrs_cached(path, "memory")
+    )
+    for i, future in memories:
         try:
-            image = Image.open(path)
-            st.markdown(f"""
+            render_html(f"""
                 <div class="memory-item">
-                    <img src="data:image/jpeg;base64,{image_to_base64(image)}" class="memory-image">
+                    <img {future.result()} loading="lazy" decoding="async" class="memory-image" style="aspect-ratio: {image_aspect_ratio(paths[i])}; background-color: {image_color(paths[i])};">
                 </div>
-            """, unsafe_allow_html=True)
+            """, slots[i])
         except Exception as e:
-            st.error(f"Error loading memory image: {e}")
+            render_error(f"Error loading memory image: {e}", slots[i])
     
-    st.markdown("</div>", unsafe_allow_html=True)
+    render_html("</div>")
 
+@st.fragment
+@timed("gift")
 def show_gift_box():
     # CHANGED: Updated heading to use centered, bold styling
-    st.markdown("<h2 class='section-header'>Your Special Gift</h2>", unsafe_allow_html=True)
+    render_html("<h2 class='section-header'>Your Special Gift</h2>")
     
+    path = st.session_state.event.images['gift']
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        # Gift box HTML with fixed event handling
-        gift_box_class = "opened" if st.session_state.gift_opened else ""
-        gift_image = image_to_base64(Image.open(IMAGE_PATHS['gift']))
-        
-        st.markdown(f"""
-            <div class="gift-box-container">
-                <div class="gift-box {gift_box_class}" onclick="this.classList.toggle('opened')">
-                    <div class="gift-box-front">
-                        <div style="text-align: center;">
-                            <div style="font-size: 5rem;">🎁</div>
-                            <p style="margin-top: 1rem; color: white;">Click to open!</p>
-                        </div>
-                    </div>
-                    <div class="gift-box-back" style="display: flex; justify-content: center; align-items: center; height: 100%;">
-                        <img src="data:image/jpeg;base64,{gift_image}" 
-                             style="width: 100%; height: 100%; object-fit: contain; border-radius:10px;">
-                    </div>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Button to toggle gift box state
-        if st.button("Open/Close Gift", use_container_width=True):
-            st.session_state.gift_opened = not st.session_state.gift_opened
-            st.rerun()
+        try:
+            render_component(
+                gift_box,
+                key="gift_box",
+                data={
+                    "src": image_url(path, "gift"),
+                    "srcset": image_srcset(path, "gift", image_url),
+                    "color": image_color(path),
+                },
+            )
+        except Exception as e:
+            render_error(f"Error loading gift image: {e}")
 
+@st.fragment
+@timed("puzzle")
 def show_puzzle_game():
     # CHANGED: Updated heading to use centered, bold styling
-    st.markdown("<h2 class='section-header'>Photo Puzzle Challenge</h2>", unsafe_allow_html=True)
-    st.markdown("<p style='text-align: center;'>Click on two pieces to swap them. Try to arrange the image correctly!</p>", unsafe_allow_html=True)
+    render_html("<h2 class='section-header'>Photo Puzzle Challenge</h2>")
+    render_html("<p style='text-align: center;'>Click on two pieces to swap them. Try to arrange the image correctly!</p>")
     
-    # Create the puzzle board
-    cols = st.columns(3)
-    for i in range(9):
-        x, y = st.session_state.puzzle_pieces[i]
-        with cols[i % 3]:
-            # Create a button for each puzzle piece
-            if st.button(f"Piece {i+1}", key=f"puzzle_{i}", use_container_width=True):
-                # Handle piece selection
-                if st.session_state.selected_piece is None:
-                    st.session_state.selected_piece = i
-                else:
-                    # Swap the selected pieces
-                    idx1 = st.session_state.selected_piece
-                    idx2 = i
-                    st.session_state.puzzle_pieces[idx1], st.session_state.puzzle_pieces[idx2] = \
-                        st.session_state.puzzle_pieces[idx2], st.session_state.puzzle_pieces[idx1]
-                    st.session_state.selected_piece = None
-                st.rerun()
-            
-            # Display the puzzle piece
-            try:
-                bg_img = image_to_base64(Image.open(IMAGE_PATHS['puzzle']))
-                st.markdown(f"""
-                    <div class="puzzle-piece {'selected' if st.session_state.selected_piece == i else ''}" 
-                         style="background-image: url('data:image/jpeg;base64,{bg_img}'); 
-                                background-position: {x}% {y}%;">
-                    </div>
-                """, unsafe_allow_html=True)
-            except Exception as e:
-                st.error(f"Error loading puzzle image: {e}")
+    board = st.session_state.puzzle_board
+    # Widget state is dropped while the page is hidden, so resync it with the board
+    st.session_state.puzzle_grid = board.grid
+    st.select_slider("Grid size", options=PUZZLE_GRID_SIZES, key="puzzle_grid",
+                     format_func=lambda n: f"{n} x {n}", on_change=resize_puzzle)
     
-    # Check if puzzle is complete
-    original_positions = [(x, y) for y in [0, 50, 100] for x in [0, 50, 100]]
-    if st.session_state.puzzle_pieces == original_positions:
-        st.session_state.puzzle_complete = True
+    # The board itself runs in the browser and sends back batches of swaps
+    try:
+        tiles = [puzzle_tile_url(st.session_state.event.images['puzzle'], board.grid, tile) for tile in range(len(board))]
+    except Exception as e:
+        render_error(f"Error loading puzzle image: {e}")
+    else:
+        render_component(
+            swap_puzzle,
+            key="swap_puzzle",
+            data={
+                "grid": board.grid,
+                "tiles": tiles,
+                "slots": list(board.slots),
+                "hint": list(st.session_state.puzzle_hint or ()),
+            },
+            default={},
+            on_moves_change=apply_puzzle_moves,
+        )
     
     # Show congratulations message if puzzle is complete
-    if st.session_state.puzzle_complete:
+    if board.solved:
         st.balloons()
-        st.markdown("""
+        render_html("""
             <div style="text-align: center; margin-top: 2rem; padding: 1rem; background-color: var(--light); border-radius: 10px;">
                 <h3>🎉 Congratulations! 🎉</h3>
                 <p>You completed the puzzle! You're amazing!</p>
             </div>
-        """, unsafe_allow_html=True)
+        """)
     
-    # Reset button
-    if st.button("Reset Puzzle", use_container_width=True):
-        positions = [(x, y) for y in [0, 50, 100] for x in [0, 50, 100]]
-        random.shuffle(positions)
-        st.session_state.puzzle_pieces = positions
-        st.session_state.selected_piece = None
-        st.session_state.puzzle_complete = False
-        st.rerun()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("Hint", use_container_width=True, disabled=board.solved, on_click=show_puzzle_hint)
+    with col2:
+        # Reset button
+        st.button("Reset Puzzle", use_container_width=True, on_click=new_puzzle, args=(board.grid,))
 
+@st.fragment
+@timed("cake")
 def show_cake_decorator():
     # CHANGED: Updated heading to use centered, bold styling
-    st.markdown("<h2 class='section-header'>Design Your Birthday Cake</h2>", unsafe_allow_html=True)
+    render_html("<h2 class='section-header'>Design Your Birthday Cake</h2>")
     
+    event = st.session_state.event
     # Profile card
-    st.markdown("""
-        <div class="profile-card">
-            <div class="profile-icon">🦋</div>
-            <div class="profile-name">Vyshnavi</div>
-            <div class="profile-title">Birthday Girl</div>
-            <div class="profile-details">
-                <div class="detail-item">
-                    <div class="detail-label">Birthday:</div>
-                    <div class="detail-value">Today!</div>
-                </div>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+    render_html(event.profile_html)
     
-    col1, col2 = st.columns([1, 1])
-    
-    with col1:
-        st.markdown("<div class='cake-result'>", unsafe_allow_html=True)
-        try:
-            selected_cake_path = IMAGE_PATHS['cake'][st.session_state.selected_cake]
-            st.image(Image.open(selected_cake_path), caption="Your Custom Birthday Cake", use_container_width=True)
-            
-            # Birthday message in a styled box
-            st.markdown("""
-                <div class="birthday-message">
-                    <h3>🎉 Happy Birthday Vyshnavi! 🎉</h3>
-                </div>
-            """, unsafe_allow_html=True)
-        except Exception as e:
-            st.error(f"Error loading cake image: {e}")
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with col2:
-        # CHANGED: Updated heading to use the same bold, Poppins font
-        st.markdown("<h3 style='font-weight: 800; font-family: \"Poppins\", sans-serif;'>Choose Your Flavor</h3>", unsafe_allow_html=True)
-        
-        cake_options = list(IMAGE_PATHS['cake'].keys())
-        for cake_type in cake_options:
-            # CHANGED: Using the cake-option-text class for bold text
-            if st.button(f"{cake_type.capitalize()} Cake", key=f"cake_{cake_type}", use_container_width=True):
-                st.session_state.selected_cake = cake_type
-                st.rerun()
+    try:
+        previews = {cake_type: image_url(path, "cake") for cake_type, path in event.images['cake'].items()}
+    except Exception as e:
+        render_error(f"Error loading cake image: {e}")
+        return
+    render_component(
+        cake_picker,
+        key="cake_picker",
+        data={
+            "previews": previews,
+            "labels": {cake_type: f"{cake_type.capitalize()} Cake" for cake_type in previews},
+            "colors": {cake_type: image_color(path) for cake_type, path in event.images['cake'].items()},
+            "message": event.message,
+            "selected": st.session_state.selected_cake,
+        },
+        default={"flavor": st.session_state.selected_cake},
+        on_flavor_change=sync_cake_flavor,
+    )
 
 # ----------------- Main App -----------------
+@timed("main")
 def main():
+    # Runs in the background; pages encode on demand until it is ready
+    warmup = start_warmup()
+    if METRICS_ENDPOINT:
+        start_asset_server()
+    if st.session_state.event is None:
+        render_error(event_error)
+        return
+    get_metrics().annotate("event", st.session_state.event.id)
+    get_metrics().annotate("page", st.session_state.current_page)
+    get_metrics().annotate("warm", warmup.ready.is_set())
+    
     # Verify all images exist
-    missing_images = verify_image_paths()
+    missing_images = verify_image_paths(st.session_state.event.images)
     if missing_images:
-        st.error(f"Missing images: {', '.join(missing_images)}")
+        render_error(f"Missing images: {', '.join(missing_images)}")
         return
 
     load_css()
     show_header()
-    create_sidebar()
+    with st.sidebar:
+        create_sidebar()
     
     if st.session_state.current_page == "gallery":
         show_gallery()
@@ -0,0 +1,191 @@
+"""Single-file asset pack: many small files concatenated behind an offset index.
+
+A pack starts with a header and an index of (name, sha256, offset, length)
+entries followed by the file contents. Contents are stored once per sha256, so
+files with identical bytes share one payload. AssetPack memory-maps the pack
+read-only and hands out memoryview slices, so serving a packed file needs no
+open or read call and every process mapping the same pack shares its pages in
+the OS page cache.
+
+The pack also carries a precompiled image manifest (dimensions, content hash
+and dominant color of every image under images/), so a fresh deployment can
+serve without hashing and decoding every image first. Building a pack reports
+exact and near-duplicate images (by perceptual hash) under images/, which waste
+storage and bandwidth even when their bytes differ; derivatives in
+static/assets/ resemble their originals by design and are not reported:
+
+    python assetpack.py                      # images/ and static/assets/ -> assets.pack
+    python assetpack.py -o other.pack images
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import imaging
+
+MAGIC = b"WAPK"
+VERSION = 1
+# magic, version, entry count
+HEADER = struct.Struct("<4sHI")
+# name length, sha256 digest, offset, length; the UTF-8 name follows each entry
+ENTRY = struct.Struct("<H32sQQ")
+DEFAULT_PATH = "assets.pack"
+DEFAULT_DIRS = ("images", os.path.join("static", "assets"))
+# Images under this directory get precompiled manifest entries, stored under
+# MANIFEST_NAME, which no packed file can have since packed files are in dirs
+MANIFEST_DIR = "images"
+MANIFEST_NAME = "manifest.json"
+# Where app.py persists its own manifest by default; not packed, since the pack
+# carries a fresh one and the file changes whenever the app rescans
+APP_MANIFEST_PATH = os.path.join(MANIFEST_DIR, MANIFEST_NAME)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+# Perceptual hashes at most this many bits apart are reported as near-duplicates
+NEAR_DUPLICATE_DISTANCE = 10
+
+
+class AssetPack:
+    """Read-only, memory-mapped view of a pack file, safe to share between threads"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, count = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} asset pack")
+        self._index = {}
+        position = HEADER.size
+        for _ in range(count):
+            name_length, digest, offset, length = ENTRY.unpack_from(self._view, position)
+            position += ENTRY.size
+            name = bytes(self._view[position:position + name_length]).decode("utf-8")
+            position += name_length
+            self._index[name] = (offset, length, digest.hex())
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def sha256(self, name):
+        entry = self._index.get(name)
+        return entry[2] if entry else None
+
+    def get(self, name, sha256=None):
+        """Zero-copy slice of a packed file, or None when it is not packed or its
+        hash differs from sha256 (the file changed after the pack was built)"""
+        entry = self._index.get(name)
+        if entry is None or (sha256 is not None and entry[2] != sha256):
+            return None
+        offset, length, _ = entry
+        return self._view[offset:offset + length]
+
+    def manifest(self):
+        """Precompiled image manifest entries by path, empty for packs built without"""
+        data = self.get(MANIFEST_NAME)
+        return json.loads(bytes(data)) if data is not None else {}
+
+
+def pack_name(path, root):
+    """Index name of a file: its path relative to root with forward slashes"""
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, "/")
+
+def _walk(root, dirs, exclude=()):
+    """(name, path) of every file under dirs except the exclude paths, in a stable order"""
+    exclude = {os.path.abspath(path) for path in exclude}
+    for directory in dirs:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                if os.path.abspath(path) not in exclude:
+                    yield pack_name(path, root), path
+
+def build_pack(output, root, dirs=DEFAULT_DIRS):
+    """Pack every file under dirs (relative to root) into output, with a
+    manifest of the images under MANIFEST_DIR.
+
+    Returns {sha256: [names]} for the stored payloads. The pack is written next
+    to output and renamed into place, so processes that still map an older pack
+    keep a consistent view."""
+    contents, manifest = [], {}
+    for name, path in _walk(root, dirs, exclude=(output, os.path.join(root, APP_MANIFEST_PATH))):
+        with open(path, "rb") as f:
+            data = f.read()
+        contents.append((name, data))
+        if name.startswith(MANIFEST_DIR + "/") and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            try:
+                info = imaging.describe(path)
+            except OSError:
+                continue
+            stat = os.stat(path)
+            manifest[name] = {
+                **info,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size
+            }
+    contents.append((MANIFEST_NAME, json.dumps(manifest, sort_keys=True).encode()))
+    index_size = sum(ENTRY.size + len(name.encode("utf-8")) for name, _ in contents)
+    offset = HEADER.size + index_size
+    entries, payloads = [], {}
+    for name, data in contents:
+        digest = hashlib.sha256(data).digest()
+        if digest not in payloads:
+            payloads[digest] = (offset, data, [])
+            offset += len(data)
+        payload_offset, _, names = payloads[digest]
+        names.append(name)
+        entries.append((name.encode("utf-8"), digest, payload_offset, len(data)))
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for name, digest, data_offset, length in entries:
+            f.write(ENTRY.pack(len(name), digest, data_offset, length))
+            f.write(name)
+        for _, data, _ in payloads.values():
+            f.write(data)
+    os.replace(tmp_path, output)
+    return {digest.hex(): names for digest, (_, _, names) in payloads.items()}
+
+def near_duplicate_groups(root, dirs=(MANIFEST_DIR,), max_distance=NEAR_DUPLICATE_DISTANCE):
+    """Groups of images under dirs whose perceptual hashes are within max_distance bits"""
+    hashes = {}
+    for name, path in _walk(root, dirs):
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            try:
+                hashes[name] = imaging.perceptual_hash(path)
+            except OSError:
+                continue
+    return imaging.NearDuplicateIndex(hashes).groups(max_distance)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dirs", nargs="*", default=DEFAULT_DIRS, help="directories to pack, relative to --root")
+    parser.add_argument("-o", "--output", default=DEFAULT_PATH)
+    parser.add_argument("--root", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--max-distance", type=int, default=NEAR_DUPLICATE_DISTANCE,
+                        help="perceptual hash bits within which images count as near-duplicates")
+    args = parser.parse_args(argv)
+    output = os.path.join(args.root, args.output)
+    payloads = build_pack(output, args.root, args.dirs)
+    files = sum(len(names) for names in payloads.values())
+    print(f"packed {files} files as {len(payloads)} payloads into {output} ({os.path.getsize(output)} bytes)")
+    # Only source images are reported: derivatives match their originals by design
+    for names in payloads.values():
+        names = [name for name in names if name.startswith(MANIFEST_DIR + "/")]
+        if len(names) > 1:
+            print(f"identical: {', '.join(names)}")
+    for group in near_duplicate_groups(args.root, max_distance=args.max_distance):
+        print(f"near-duplicate: {', '.join(group)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,202 @@
+"""Headless rerun benchmark for every page, driven through Streamlit's AppTest.
+
+Reports per-rerun latency percentiles, HTML bytes emitted per rerun and memory
+(peak RSS and tracemalloc peak) for each scenario, and exits non-zero when a
+scenario's bytes per rerun or tracemalloc peak regresses against the stored
+baseline. Latency depends on the machine, so it is only recorded and compared
+with --latency, against a baseline recorded on the same box; the committed
+baseline.json carries no latency figures.
+
+Usage:
+    python benchmarks/bench_pages.py                              # compare with baseline.json
+    python benchmarks/bench_pages.py --update-baseline            # record a new baseline
+    python benchmarks/bench_pages.py --latency --baseline local.json --update-baseline
+    python benchmarks/bench_pages.py --latency --baseline local.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from loadtest import ROOT, percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MEMORY_ITERATIONS = 5
+LATENCY_FIELDS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def click(at, key):
+    at.button(key=key).click().run()
+
+
+def click_label(at, label):
+    next(button for button in at.button if button.label == label).click().run()
+
+
+def scenario_gallery(at, i):
+    click(at, "gallery_btn")
+
+
+def scenario_memory(at, i):
+    click(at, "memory_btn")
+
+
+def scenario_gift(at, i):
+    # Opening the box never reaches the server, so only page views are measured
+    click(at, "gift_btn")
+
+
+def scenario_puzzle_swap(at, i):
+    # The board is a custom component AppTest cannot click; apply the swap its
+    # on_moves_change callback would and rerun
+    board = at.session_state.puzzle_board
+    board.swap(i % len(board), (i + 1) % len(board))
+    at.session_state.puzzle_hint = None
+    at.run()
+
+
+def scenario_puzzle_reset(at, i):
+    click_label(at, "Reset Puzzle")
+
+
+def scenario_cake(at, i):
+    # The cake picker is a custom component AppTest cannot click; apply the
+    # flavor its on_flavor_change callback would sync and rerun
+    flavors = ["classic", "chocolate", "strawberry"]
+    at.session_state.selected_cake = flavors[i % len(flavors)]
+    at.run()
+
+
+# name -> (page to open first, one interaction per rerun)
+SCENARIOS = {
+    "gallery": ("gallery", scenario_gallery),
+    "memory": ("memory", scenario_memory),
+    "gift": ("gift", scenario_gift),
+    "puzzle_swap": ("puzzle", scenario_puzzle_swap),
+    "puzzle_reset": ("puzzle", scenario_puzzle_reset),
+    "cake_switch": ("cake", scenario_cake),
+}
+
+
+def read_records(path, start):
+    """Rerun records logged after line start, skipping the background warm-up's"""
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f.readlines()[start:]]
+    return [record for record in records if record["root"] != "warmup"]
+
+
+def run(iterations):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.run()
+    results = {}
+    for name, (page, step) in SCENARIOS.items():
+        click(at, f"{page}_btn")
+        seen = sum(1 for _ in open(os.environ["METRICS_LOG"], encoding="utf-8"))
+        latencies = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            step(at, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if at.exception:
+                raise RuntimeError(f"{name}: {at.exception[0].message}")
+        records = read_records(os.environ["METRICS_LOG"], seen)
+        # tracemalloc slows everything down, so allocations get their own pass
+        tracemalloc.start()
+        for i in range(MEMORY_ITERATIONS):
+            step(at, i)
+        allocated_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        html_bytes = [record["counters"].get("html_bytes", 0) for record in records]
+        results[name] = {
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "bytes_per_rerun": round(statistics.mean(html_bytes)) if html_bytes else 0,
+            "tracemalloc_peak_kb": round(allocated_peak / 1024),
+        }
+    return results
+
+
+def compare(results, baseline, latency_tolerance, bytes_tolerance, memory_tolerance):
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if latency_tolerance is not None and result["p95_ms"] > base["p95_ms"] * (1 + latency_tolerance):
+            failures.append(f"{name}: p95 {result['p95_ms']}ms > baseline {base['p95_ms']}ms")
+        if result["bytes_per_rerun"] > base["bytes_per_rerun"] * (1 + bytes_tolerance):
+            failures.append(f"{name}: {result['bytes_per_rerun']} bytes/rerun > baseline {base['bytes_per_rerun']}")
+        if result["tracemalloc_peak_kb"] > base["tracemalloc_peak_kb"] * (1 + memory_tolerance):
+            failures.append(f"{name}: tracemalloc peak {result['tracemalloc_peak_kb']}KB > baseline {base['tracemalloc_peak_kb']}KB")
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--latency", action="store_true",
+                        help="also record and compare p95 latency; only meaningful against a baseline from this machine")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5,
+                        help="allowed relative p95 latency increase with --latency (default 0.5)")
+    parser.add_argument("--bytes-tolerance", type=float, default=0.05,
+                        help="allowed relative bytes/rerun increase (default 0.05)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25,
+                        help="allowed relative tracemalloc peak increase (default 0.25)")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    log = tempfile.NamedTemporaryFile(prefix="bench-metrics-", suffix=".jsonl", delete=False)
+    log.close()
+    os.environ["METRICS_LOG"] = log.name
+    # A background warm-up would compete with the first scenarios for CPU
+    os.environ.setdefault("WARMUP_WORKERS", "0")
+    try:
+        results = run(args.iterations)
+    finally:
+        os.unlink(log.name)
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"{'scenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'bytes/rerun':>12} {'tracemalloc KB':>15}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+              f"{r['bytes_per_rerun']:>12} {r['tracemalloc_peak_kb']:>15}")
+    print(f"peak RSS: {peak_rss_mb:.1f} MB")
+
+    if args.update_baseline:
+        if not args.latency:
+            results = {name: {key: value for key, value in r.items() if key not in LATENCY_FIELDS}
+                       for name, r in results.items()}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against; run with --update-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    latency_tolerance = None
+    if args.latency:
+        if all("p95_ms" in base for base in baseline.values()):
+            latency_tolerance = args.latency_tolerance
+        else:
+            print("baseline has no latency figures; record one on this machine with --latency --update-baseline")
+    failures = compare(results, baseline, latency_tolerance, args.bytes_tolerance, args.memory_tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+"""Benchmark the puzzle engine on large grids.
+
+Usage: python benchmarks/bench_puzzle.py [grid ...]
+"""
+import os
+import random
+import sys
+import timeit
+
+import streamlit.logger
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing app outside `streamlit run` warns about the missing script context
+streamlit.logger.set_log_level("error")
+
+from app import PuzzleBoard  # noqa: E402
+
+DEFAULT_GRIDS = [3, 10, 32, 100]
+
+
+def per_call(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def bench(grid):
+    rng = random.Random(grid)
+    board = PuzzleBoard.shuffled(grid, rng)
+    size = len(board)
+    pairs = [(rng.randrange(size), rng.randrange(size)) for _ in range(1000)]
+
+    # Only the last two tiles misplaced: hint() has to scan the whole board
+    nearly_solved = PuzzleBoard(grid)
+    nearly_solved.swap(size - 2, size - 1)
+
+    def swaps():
+        for a, b in pairs:
+            board.swap(a, b)
+
+    return {
+        "grid": f"{grid}x{grid}",
+        "shuffle_ms": per_call(lambda: PuzzleBoard.shuffled(grid, rng), 10) * 1e3,
+        "swap_us": per_call(swaps, 10) / len(pairs) * 1e6,
+        "solved_us": per_call(lambda: board.solved, 10000) * 1e6,
+        "hint_us": per_call(nearly_solved.hint, 100) * 1e6,
+        "min_swaps_ms": per_call(board.min_swaps, 10) * 1e3,
+    }
+
+
+def main(argv):
+    grids = [int(arg) for arg in argv] or DEFAULT_GRIDS
+    print(f"{'grid':>9} {'shuffle ms':>11} {'swap us':>9} {'solved us':>10} {'hint us':>9} {'min_swaps ms':>13}")
+    for grid in grids:
+        r = bench(grid)
+        print(f"{r['grid']:>9} {r['shuffle_ms']:>11.3f} {r['swap_us']:>9.3f} {r['solved_us']:>10.3f} "
+              f"{r['hint_us']:>9.3f} {r['min_swaps_ms']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,155 @@
+"""Cold-start benchmark for app.py.
+
+Reports what a freshly started worker pays before it serves its first viewer:
+
+- import: total `python -X importtime -c "import app"` time, the slowest direct
+  imports, and whether modules meant to load lazily (Pillow, NumPy) were
+  imported anyway
+- ready: from launching `streamlit run` until its health check answers
+- first render: from opening the first session until its first run finishes
+- warm-up: whether the background warm-up's worker processes imported
+  Streamlit, which they only do when they re-run app.py
+
+Each figure is the median over --runs fresh processes, started without a
+persisted image manifest as on a new pod; an asset pack (python assetpack.py)
+is used when present. Exits non-zero when a lazy module is imported eagerly, a
+warm-up worker imports Streamlit, or a figure regresses against
+startup_baseline.json.
+
+Usage:
+    python benchmarks/bench_startup.py                    # compare with startup_baseline.json
+    python benchmarks/bench_startup.py --update-baseline  # record a new baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+
+from loadtest import ROOT, Session, free_port, start_server
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+LAZY_MODULES = ("PIL", "numpy")
+IMPORT_LINE = re.compile(r"import time:\s*(\d+) \|\s*(\d+) \| ( *)(\S+)")
+WORKER_STREAMLIT = re.compile(r"^webapp_worker_streamlit_imports_total (\S+)$", re.MULTILINE)
+WARMUP_TIMEOUT = 120
+
+
+def import_times(env):
+    """Total ms and {module: (depth, cumulative ms)} of importing app in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, capture_output=True, text=True, env=env, check=True,
+    )
+    total, modules = 0.0, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        depth = len(indent) // 2
+        modules[name] = (depth, int(cumulative_us) / 1000)
+        if depth == 0:
+            total += int(cumulative_us) / 1000
+    return total, modules
+
+
+async def first_render(port):
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                  max_size=None, open_timeout=60) as ws:
+        session = Session(ws)
+        await session.rerun()
+        return session.latencies[0] * 1000
+
+
+def warmup_streamlit_imports(metrics_port):
+    """Warm-up tasks that ran in a worker with Streamlit imported, once the warm-up finished"""
+    deadline = time.time() + WARMUP_TIMEOUT
+    while time.time() < deadline:
+        with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as response:
+            text = response.read().decode()
+        if "webapp_warmup_ready 1" in text:
+            match = WORKER_STREAMLIT.search(text)
+            return float(match.group(1)) if match else 0
+        time.sleep(0.2)
+    raise RuntimeError(f"warm-up did not finish within {WARMUP_TIMEOUT}s")
+
+
+def run(runs):
+    imports, ready, render, modules, worker_streamlit = [], [], [], {}, 0
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmp:
+            # A manifest path that does not exist yet, as on a new pod
+            env = {"IMAGE_MANIFEST_PATH": os.path.join(tmp, "manifest.json")}
+            metrics_port = free_port()
+            server_env = {**env, "METRICS_ENDPOINT": "1", "ASSET_SERVER_PORT": str(metrics_port)}
+            total, modules = import_times({**os.environ, **env})
+            imports.append(total)
+            port = free_port()
+            start = time.perf_counter()
+            server = start_server(port, server_env)
+            try:
+                ready.append((time.perf_counter() - start) * 1000)
+                render.append(asyncio.run(first_render(port)))
+                worker_streamlit += warmup_streamlit_imports(metrics_port)
+            finally:
+                server.terminate()
+                server.wait()
+    lazy_imported = sorted({name.split(".")[0] for name in modules} & set(LAZY_MODULES))
+    slowest = sorted(((ms, name) for name, (depth, ms) in modules.items() if depth == 1), reverse=True)[:5]
+    results = {
+        "import_ms": round(statistics.median(imports), 1),
+        "ready_ms": round(statistics.median(ready), 1),
+        "first_render_ms": round(statistics.median(render), 1),
+    }
+    return results, slowest, lazy_imported, worker_streamlit
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative increase of each figure (default 0.5)")
+    args = parser.parse_args(argv)
+
+    results, slowest, lazy_imported, worker_streamlit = run(args.runs)
+    print(f"import app:     {results['import_ms']:>8} ms")
+    for ms, name in slowest:
+        print(f"  {name:<28} {ms:>8.1f} ms")
+    print(f"server ready:   {results['ready_ms']:>8} ms")
+    print(f"first render:   {results['first_render_ms']:>8} ms")
+    print(f"asset pack:     {'yes' if os.path.exists(os.path.join(ROOT, 'assets.pack')) else 'no'}")
+
+    failures = [f"{module} imported by app at startup" for module in lazy_imported]
+    if worker_streamlit:
+        failures.append(f"streamlit imported by warm-up workers ({worker_streamlit:g} tasks)")
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        print("no baseline to compare against; run with --update-baseline")
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for name, value in results.items():
+            if name in baseline and value > baseline[name] * (1 + args.tolerance):
+                failures.append(f"{name}: {value} > baseline {baseline[name]}")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
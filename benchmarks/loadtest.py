@@ -0,0 +1,274 @@
+"""Concurrent-session load generator for app.py.
+
+Opens many simultaneous browser-like sessions against one Streamlit server
+over its local websocket and replays randomized click streams: sidebar
+navigation, puzzle swaps and resets, cake flavor switches and gallery paging
+(the gift box opens in the browser alone). Reports session setup rate, rerun
+throughput, rerun latency under contention and server memory growth per
+session, measured from a server one warm-up session has already taken
+through every page. Everything runs on localhost; by default the script
+starts (and stops) its own server.
+
+Usage:
+    python benchmarks/loadtest.py --sessions 200 --clicks 20
+    python benchmarks/loadtest.py --url ws://127.0.0.1:8501 --server-pid 1234
+
+Requires the `websockets` package, which Streamlit installs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["gallery", "memory", "gift", "puzzle", "cake"]
+CAKES = ["classic", "chocolate", "strawberry"]
+# Chance that the next click is a sidebar navigation instead of a page interaction
+NAVIGATION_PROBABILITY = 0.2
+
+
+class Session:
+    """One simulated viewer speaking Streamlit's websocket protocol"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.page = "gallery"
+        self.buttons = {}
+        self.components = {}
+        self.latencies = []
+        self.bytes_received = 0
+
+    async def rerun(self, fragment_id="", **widget):
+        """Trigger a rerun and wait for it to finish.
+
+        widget, if given, holds the fields of the one WidgetState to send, e.g.
+        id and trigger_value for a button click."""
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()
+        if widget:
+            msg.rerun_script.widget_states.widgets.add(**widget)
+            msg.rerun_script.fragment_id = fragment_id
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            data = await self.ws.recv()
+            self.bytes_received += len(data)
+            fmsg = ForwardMsg()
+            fmsg.ParseFromString(data)
+            kind = fmsg.WhichOneof("type")
+            if kind == "delta" and fmsg.delta.WhichOneof("type") == "new_element":
+                element = fmsg.delta.new_element
+                if element.WhichOneof("type") == "button":
+                    self._register(element.button, fmsg.delta.fragment_id)
+                elif element.WhichOneof("type") == "bidi_component":
+                    self.components[element.bidi_component.component_name] = (
+                        element.bidi_component.id, fmsg.delta.fragment_id
+                    )
+            elif kind == "script_finished":
+                break
+        self.latencies.append(time.perf_counter() - start)
+
+    def _register(self, button, fragment_id):
+        # Widget ids end in the user key when one was given; otherwise use the label
+        key = button.id.rsplit("-", 1)[1] if button.id.startswith("$$ID-") else ""
+        self.buttons[key if key and key != "None" else button.label] = (button.id, fragment_id)
+
+    async def click(self, button):
+        if button in self.buttons:
+            widget_id, fragment_id = self.buttons[button]
+            await self.rerun(fragment_id, id=widget_id, trigger_value=True)
+
+    async def set_state(self, component, state):
+        """Send a custom component's new state, as its setStateValue would"""
+        if component in self.components:
+            widget_id, fragment_id = self.components[component]
+            await self.rerun(fragment_id, id=widget_id, json_value=json.dumps(state))
+
+    async def trigger(self, component, event, value):
+        """Send a custom component's one-shot event, as its setTriggerValue would"""
+        if component in self.components:
+            widget_id, fragment_id = self.components[component]
+            await self.rerun(
+                fragment_id, id=f"$$STREAMLIT_INTERNAL_KEY_{widget_id}__events",
+                json_trigger_value=json.dumps([{"event": event, "value": value}]),
+            )
+
+    async def act(self, rng):
+        """Perform one step of a randomized but page-appropriate click stream"""
+        if rng.random() < NAVIGATION_PROBABILITY:
+            self.page = rng.choice(PAGES)
+            await self.click(f"{self.page}_btn")
+        elif self.page == "puzzle":
+            if rng.random() < 0.1:
+                await self.click("Reset Puzzle")
+            else:
+                # The board batches a burst of swaps into one message
+                moves = [rng.sample(range(9), 2) for _ in range(rng.randint(1, 4))]
+                await self.trigger("swap_puzzle", "moves", moves)
+        elif self.page == "cake":
+            # Previews swap in the browser; only the chosen flavor reaches the server
+            await self.set_state("cake_picker", {"flavor": rng.choice(CAKES)})
+        elif self.page == "gallery" and "gallery_next_top" in self.buttons:
+            await self.click(rng.choice(["gallery_next_top", "gallery_prev_top"]))
+        else:
+            self.page = rng.choice(PAGES)
+            await self.click(f"{self.page}_btn")
+
+
+def rss_kb(pid):
+    if not pid:
+        return None
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, env=None):
+    """Start app.py on port, with env added to the environment, and wait until it is healthy"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, **(env or {})},
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Streamlit server did not become healthy")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))]
+
+
+async def run_session(url, index, clicks, think, connected, finish, sessions):
+    rng = random.Random(index)
+    async with websockets.connect(f"{url}/_stcore/stream", subprotocols=["streamlit"],
+                                  max_size=None, open_timeout=60) as ws:
+        session = Session(ws)
+        sessions.append(session)
+        await session.rerun()
+        connected.append(time.perf_counter())
+        # Hold every session open until all are connected, so memory is measured with all alive
+        await finish.wait()
+        for _ in range(clicks):
+            await session.act(rng)
+            if think:
+                await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def warm_up(url):
+    """Open one session and visit every page, so the server has run app.py,
+    built its manifest and filled its caches before memory is baselined"""
+    async with websockets.connect(f"{url}/_stcore/stream", subprotocols=["streamlit"],
+                                  max_size=None, open_timeout=60) as ws:
+        session = Session(ws)
+        await session.rerun()
+        for page in PAGES:
+            await session.click(f"{page}_btn")
+
+
+async def load(url, count, clicks, think, pid):
+    sessions, connected = [], []
+    finish = asyncio.Event()
+    # Baseline after one-time startup work, so only per-session memory is spread over count
+    await warm_up(url)
+    rss_before = rss_kb(pid)
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(run_session(url, i, clicks, think, connected, finish, sessions))
+             for i in range(count)]
+    while len(connected) < count and not any(task.done() for task in tasks):
+        await asyncio.sleep(0.05)
+    setup_seconds = time.perf_counter() - start
+    rss_connected = rss_kb(pid)
+    finish.set()
+    click_start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    click_seconds = time.perf_counter() - click_start
+    rss_after = rss_kb(pid)
+
+    latencies = [latency for session in sessions for latency in session.latencies]
+    reruns = len(latencies)
+    interactive = [latency for session in sessions for latency in session.latencies[1:]]
+    report = {
+        "sessions": count,
+        "sessions_per_sec": round(count / setup_seconds, 2),
+        "reruns": reruns,
+        "reruns_per_sec": round(len(interactive) / click_seconds, 2) if click_seconds else None,
+        "latency_ms": {
+            f"p{pct}": round(percentile(interactive or latencies, pct) * 1000, 1) for pct in (50, 95, 99)
+        },
+        "bytes_per_rerun": round(sum(session.bytes_received for session in sessions) / reruns),
+    }
+    if rss_before is not None:
+        report["server_rss_mb"] = {
+            "warm": round(rss_before / 1024, 1),
+            "connected": round(rss_connected / 1024, 1),
+            "after": round(rss_after / 1024, 1),
+        }
+        report["rss_kb_per_session"] = round((rss_connected - rss_before) / count, 1)
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--clicks", type=int, default=20, help="interactions per session")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds between clicks")
+    parser.add_argument("--url", help="ws:// base URL of a running server (default: start one)")
+    parser.add_argument("--server-pid", type=int, help="pid of the server given by --url, for RSS")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url, pid = args.url, args.server_pid
+    if url is None:
+        port = free_port()
+        server = start_server(port)
+        url, pid = f"ws://127.0.0.1:{port}", server.pid
+    try:
+        report = asyncio.run(load(url.rstrip("/"), args.sessions, args.clicks, args.think, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"sessions:            {report['sessions']} ({report['sessions_per_sec']} connected/s)")
+    print(f"reruns:              {report['reruns']} ({report['reruns_per_sec']} interactive reruns/s)")
+    latency = report["latency_ms"]
+    print(f"rerun latency ms:    p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}")
+    print(f"bytes per rerun:     {report['bytes_per_rerun']}")
+    if "server_rss_mb" in report:
+        rss = report["server_rss_mb"]
+        print(f"server RSS MB:       {rss['warm']} warm, {rss['connected']} connected, {rss['after']} after")
+        print(f"RSS per session:     {report['rss_kb_per_session']} KB")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
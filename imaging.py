@@ -0,0 +1,219 @@
+"""Image decoding and encoding for app.py.
+
+Nothing here imports Streamlit or touches session state, so warm-up worker
+processes can import this module and run its tasks directly. Functions report
+work through a count(name, value=1) callback instead of the app's metrics.
+Images are read from a source: a file path, or a buffer such as an asset pack
+slice.
+
+Pillow and NumPy are imported by the functions that use them, so importing
+this module (and app.py) stays cheap and a process that is served from
+caches never loads them.
+"""
+import functools
+import io
+import sys
+
+
+@functools.cache
+def _popcount_table():
+    # Set bits in every byte value, for Hamming distances on NumPy < 2.0
+    import numpy as np
+    return np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount(values):
+    import numpy as np
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _popcount_table()[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def _ignore(name, value=1):
+    pass
+
+def _tally():
+    counts = {}
+    def count(name, value=1):
+        counts[name] = counts.get(name, 0) + value
+    # Warm-up workers are meant to import only this module and sharedcache;
+    # reported so a worker that re-ran app.py shows up in the app's metrics
+    if "streamlit" in sys.modules:
+        count("worker_streamlit_imports")
+    return counts, count
+
+@functools.cache
+def has_webp():
+    from PIL import features
+    return features.check("webp")
+
+def _open(source):
+    from PIL import Image
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+def target_size(size, box):
+    """Smallest size covering the (width, height) box, never upscaling"""
+    width, height = size
+    box_width, box_height = box
+    scale = max(box_width / width, (box_height or 0) / height)
+    if scale >= 1:
+        return size
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+def encode_image_file(source, box=None, fmt="JPEG", quality=82, count=_ignore):
+    """Read an image as JPEG bytes, or as a derivative in fmt resized to cover box.
+
+    Original JPEGs that need neither resizing nor an EXIF rotation are passed
+    through untouched; a buffer source is returned as is, without copying."""
+    from PIL import Image, ImageOps
+    count("images_opened")
+    with _open(source) as image:
+        orientation = image.getexif().get(0x0112, 1)
+        size = image.size[::-1] if orientation in (5, 6, 7, 8) else image.size
+        if box is not None and target_size(size, box) == size and fmt == "JPEG":
+            box = None
+        if box is None and image.format == "JPEG" and orientation == 1:
+            count("images_passed_through")
+            if not isinstance(source, str):
+                return source
+            with open(source, "rb") as f:
+                return f.read()
+        count("images_decoded")
+        if box is None:
+            fmt = "JPEG"
+        else:
+            target = target_size(size, box)
+            if orientation in (5, 6, 7, 8):
+                target = target[::-1]
+            # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+            image.draft("RGB", target)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        if box is not None:
+            target = target_size(image.size, box)
+            if target != image.size:
+                image = image.resize(target, Image.Resampling.LANCZOS)
+        buffered = io.BytesIO()
+        image.save(buffered, format=fmt, quality=quality)
+        count("images_encoded")
+        return buffered.getvalue()
+
+def cut_puzzle_tiles(source, grid, board_size, quality=82, count=_ignore):
+    """Crop an image to a centered square of at most board_size pixels and cut it
+    into grid x grid JPEG tiles"""
+    from PIL import Image, ImageOps
+    count("images_opened")
+    count("images_decoded")
+    with _open(source) as image:
+        board = min(min(image.size), board_size)
+        image.draft("RGB", (board, board))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image = ImageOps.fit(image, (board, board), Image.Resampling.LANCZOS)
+    side = board // grid
+    tiles = []
+    for row in range(grid):
+        for col in range(grid):
+            buffered = io.BytesIO()
+            tile = image.crop((col * side, row * side, (col + 1) * side, (row + 1) * side))
+            tile.save(buffered, format="JPEG", quality=quality)
+            tiles.append(buffered.getvalue())
+    count("images_encoded", len(tiles))
+    return tiles
+
+def perceptual_hash(source):
+    """64-bit difference hash of an image.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so re-encoded,
+    resized or slightly retouched copies hash within a few bits of each other."""
+    import numpy as np
+    from PIL import Image, ImageOps
+    with _open(source) as image:
+        image.draft("L", (64, 64))
+        image = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+def dominant_color(source):
+    """Dominant color of an image as a CSS hex color.
+
+    Pixels of a small thumbnail are binned into 512 colors (3 bits per
+    channel) and the mean of the most populated bin is returned, so a large
+    uniform area wins over an average of every tone in the picture."""
+    import numpy as np
+    from PIL import Image
+    with _open(source) as image:
+        image.draft("RGB", (64, 64))
+        image = image.convert("RGB").resize((32, 32), Image.Resampling.BILINEAR)
+    pixels = np.asarray(image, dtype=np.uint16).reshape(-1, 3)
+    bins = (pixels[:, 0] >> 5) << 6 | (pixels[:, 1] >> 5) << 3 | pixels[:, 2] >> 5
+    color = pixels[bins == np.bincount(bins).argmax()].mean(axis=0)
+    return "#" + "".join(f"{round(channel):02x}" for channel in color.tolist())
+
+def describe(source):
+    """Displayed width and height (after any EXIF rotation) and dominant color of
+    an image, as its manifest entry records them"""
+    with _open(source) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+    return {"width": width, "height": height, "color": dominant_color(source)}
+
+class NearDuplicateIndex:
+    """Perceptual hashes of a collection, searched for near-duplicates by
+    Hamming distance computed over whole blocks of hashes at once"""
+
+    def __init__(self, hashes):
+        import numpy as np
+        self.names = list(hashes)
+        self.hashes = np.array([hashes[name] for name in self.names], dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def pairs(self, max_distance=10, block=1024):
+        """Yield (name, name, distance) for every pair at most max_distance bits apart.
+
+        Each block of rows is compared with itself and every later hash, so
+        memory stays proportional to block x len(self) however large the
+        collection, and no pair is computed twice."""
+        for start in range(0, len(self), block):
+            rows = self.hashes[start:start + block]
+            distances = _popcount(rows[:, None] ^ self.hashes[None, start:])
+            row, col = (distances <= max_distance).nonzero()
+            later = row < col
+            for row, col in zip(row[later].tolist(), col[later].tolist()):
+                yield self.names[start + row], self.names[start + col], int(distances[row, col])
+
+    def groups(self, max_distance=10):
+        """Sets of two or more names linked by near-duplicate pairs"""
+        parent = {}
+        def find(name):
+            while parent.get(name, name) != name:
+                name = parent[name]
+            return name
+        for a, b, _ in self.pairs(max_distance):
+            parent[find(a)] = find(b)
+        groups = {}
+        for name in parent:
+            groups.setdefault(find(name), {find(name)}).add(name)
+        return sorted(sorted(group) for group in groups.values())
+
+# Process pool tasks: each returns (result, counters) so the parent can fold the
+# worker's counters into its own metrics. With a shared cache (see
+# sharedcache.py) and its keys, results other processes already encoded are
+# read back instead of encoded again.
+def encode_task(path, box, fmt, quality, shared=None, key=None):
+    counts, count = _tally()
+    if shared is None:
+        return encode_image_file(path, box, fmt, quality, count), counts
+    return shared.get_or_build(key, lambda: encode_image_file(path, box, fmt, quality, count), count), counts
+
+def cut_puzzle_tiles_task(path, grid, board_size, quality, shared=None, keys=None):
+    counts, count = _tally()
+    if shared is None:
+        return cut_puzzle_tiles(path, grid, board_size, quality, count), counts
+    return shared.get_or_build_all(keys, lambda: cut_puzzle_tiles(path, grid, board_size, quality, count), count), counts
@@ -0,0 +1,159 @@
+"""Derivative cache directory shared by every app process on a host.
+
+Encoded images are stored as files named by a hash of their cache key
+(content hash plus transform), so replicas behind a load balancer encode each
+derivative once between them rather than once each. Files are written under a
+temporary name and renamed into place, so readers never see a partial file.
+Building takes an exclusive lock on one of 256 lock files picked by the key's
+hash, so a process that misses while another is encoding the same derivative
+waits for that result instead of encoding it again. Lock files are never
+removed: a lock file unlinked while held would let the next process lock a
+fresh inode and build the same key concurrently. After about a tenth of the
+size budget has been written, by whichever processes, the least recently used
+files are removed until the directory fits the budget.
+
+Nothing here imports Streamlit, so warm-up worker processes can use it.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock concurrent misses may both encode; files still appear whole
+    fcntl = None
+
+# Temporary files older than this were left by dead writers
+STALE_SECONDS = 60
+LOCK_NAME = "build.lock"
+
+
+def _ignore(name, value=1):
+    pass
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class SharedCache:
+    """Files of encoded bytes under directory, bounded by max_bytes in total.
+
+    Keys are tuples of strings and numbers; processes that build the same
+    key from the same content share one file. Instances hold no open files,
+    threads or counters, so they can be passed to worker processes."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, name[:2], name)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # Mark as recently used for collect()
+            os.utime(path)
+        except OSError:
+            # E.g. a file another replica's user owns; still a hit
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        # Collect with odds proportional to the bytes written: about once per
+        # tenth of the budget however many processes share the directory,
+        # with no count to keep between them
+        if random.random() * (self.max_bytes // 10 or 1) < len(data):
+            self.collect()
+
+    @contextmanager
+    def lock(self, key):
+        """Hold an exclusive lock on key, shared by every process using the directory.
+
+        Keys whose files share a subdirectory share its lock, so unrelated
+        builds occasionally wait for each other, but the lock files stay few
+        and in place."""
+        path = os.path.join(os.path.dirname(self._path(key)), LOCK_NAME)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, "ab")
+        except OSError:
+            # An unwritable directory only costs duplicate work
+            yield
+            return
+        # Closing the file releases the lock
+        with f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def get_or_build_all(self, keys, build, count=_ignore):
+        """Values of keys built together by one build() call returning a value
+        per key, e.g. every tile of one image; built at most once across
+        processes while the files last"""
+        values = [self.get(key) for key in keys]
+        if None in values:
+            with self.lock(keys[0]):
+                # Another process may have built them while this one waited
+                values = [self.get(key) for key in keys]
+                if None in values:
+                    count("shared_cache_misses")
+                    values = build()
+                    try:
+                        for key, value in zip(keys, values):
+                            self.put(key, value)
+                    except OSError:
+                        # A full or read-only disk only costs re-encoding
+                        pass
+                    return values
+        count("shared_cache_hits")
+        return values
+
+    def get_or_build(self, key, build, count=_ignore):
+        return self.get_or_build_all([key], lambda: [build()], count)[0]
+
+    def collect(self):
+        """Remove least recently used files until the directory fits max_bytes,
+        and temporary files left behind; returns the bytes kept"""
+        now = time.time()
+        files = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if filename == LOCK_NAME:
+                    continue
+                if filename.endswith(".tmp"):
+                    if now - stat.st_mtime > STALE_SECONDS:
+                        _remove(path)
+                else:
+                    files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+        return total